@@ -1,97 +1,166 @@
 import os
+import sys
+import csv
+import time
+import argparse
+import warnings
+import resource
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-from libpysal.weights import Queen
 from spopt.region import Skater
 from sklearn.preprocessing import StandardScaler
+from skater_hierarchy import skater_hierarchy
+from memo_skater import memo_skater
+from constrained_skater import constrained_skater
+from region_engines import ENGINES, SCALED, NO_FLOOR
+from partition_metrics import score_partitions
+from k_selection import select_k
+from results_store import write_blocks, append_runs, RESULTS_DIR
+from acs_ingest import SHORT_NAMES
+from spanning_tree import METRICS, CACHE_DIR as MST_CACHE
+from weights_cache import queen_adjacency, filter_rows, to_w
+from geo_io import read_geometry
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
 
-print("="*80)
-print("SKATER regionalization over range of cluster numbers (Cook only)")
-print("="*80)
-
-# 1. Read SES shapefile and restrict to Cook County
-shp_path = os.path.join(OUT_DIR, "cook_bg_acs2020_ses.shp")
-gdf_all = gpd.read_file(shp_path)
-print(f"Total rows in original shapefile: {len(gdf_all)}")
-
-# Filter to Cook: COUNTYFP == '031' if present, else GEOID prefix
-if "COUNTYFP" in gdf_all.columns:
-    gdf = gdf_all[gdf_all["COUNTYFP"] == "031"].copy()
-else:
-    gdf = gdf_all[gdf_all["GEOID"].str.startswith("17031")].copy()
-
-print(f"Rows in Cook County subset: {len(gdf)}")
-
-# 2. Choose SES variables using your truncated names
-candidate_attrs = [
-    "pct_white_",   # % White NH
-    "pct_black_",   # % Black NH
-    "pct_asian_",   # % Asian NH
-    "pct_hispan",   # % Hispanic
-    "median_hh_",   # median HH income
-    "poverty_ra",   # poverty rate
-    "pct_ba_plu",   # % BA+
-    "unemployme",   # unemployment rate
-    "pct_owner",    # % owner
-    "pct_renter",   # % renter
-]
-
-attrs_name = [c for c in candidate_attrs if c in gdf.columns]
-print("\nUsing these SES variables for clustering:")
-print(attrs_name)
-
-# 3. Drop rows with NaNs in these columns
-gdf = gdf.dropna(subset=attrs_name).reset_index(drop=True)
-print(f"\nRows after dropping NaNs in SES variables: {len(gdf)}")
-
-# 4. Build Queen weights on Cook subset
-print("\nBuilding Queen contiguity weights on Cook subset...")
-w = Queen.from_dataframe(gdf, use_index=False)
-print("Done. Number of regions with neighbors:", len(w.neighbors))
-
-#drop islands smaller than quorum
-print("Dropping islands (units with no neighbors)...")
-islands = w.islands
-if islands:
-    gdf = gdf.drop(index=islands).reset_index(drop=True)
-    print(f"Rows after dropping islands: {len(gdf)}")
-    w = Queen.from_dataframe(gdf, use_index=False)
-else:
-    print("No islands found.")
-
-# 5. Standardize SES data
-X = gdf[attrs_name].to_numpy()
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-def compute_bss_tss(data, labels):
-    overall_mean = data.mean(axis=0)
-    tss = ((data - overall_mean) ** 2).sum()
-    wss = 0.0
-    for k in np.unique(labels):
-        cluster = data[labels == k]
-        if len(cluster) == 0:
-            continue
-        cm = cluster.mean(axis=0)
-        wss += ((cluster - cm) ** 2).sum()
-    bss = tss - wss
-    return float(bss), float(tss), float(bss / tss)
-
-# 6. Run SKATER for range 60–90
-n_clusters_range = list(range(75, 91, 5))  # 60,65,...,90
-floor = 10
-results = []
-
-for n_clust in n_clusters_range:
-    print(f"\nRunning SKATER: n_clusters = {n_clust}, floor = {floor}")
+METRIC_FIELDS = ["n_clusters", "floor", "BSS_TSS", "calinski_harabasz",
+                 "davies_bouldin", "seconds", "peak_mem_mb"]
+# Every partition is scored on the standardized attributes; the store records
+# whether its engine was given them too (region_engines.SCALED).
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="SKATER regionalization over a (k, floor) grid (Cook only)"
+    )
+    parser.add_argument("--k-min", type=int, default=75)
+    parser.add_argument("--k-max", type=int, default=90)
+    parser.add_argument("--k-step", type=int, default=5)
+    parser.add_argument("--floors", type=int, nargs="+", default=None,
+                        help="one or more region size floors (in block groups; "
+                             "in people for --engine constrained; default 10; "
+                             "ward has none)")
+    parser.add_argument("--pop-ceiling", type=float, default=None,
+                        help="region population ceiling (--engine constrained)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="size of the process pool; 1 solves in-process")
+    parser.add_argument("--engine",
+                        choices=["hierarchical", "per-k", "memo", "constrained",
+                                 "ward", "redcap"],
+                        default="hierarchical",
+                        help="prune one tree per floor up to max k, solve "
+                             "every (k, floor) from scratch, prune with "
+                             "memoized subtree sums (SSD score), prune "
+                             "with population floor/ceiling on total_pop, or "
+                             "one of the other region_engines (ward, redcap; "
+                             "maxp picks its own k and is benchmark.py only)")
+    parser.add_argument("--metric", choices=METRICS, default=None,
+                        help="spanning tree edge dissimilarity (default: "
+                             "manhattan for hierarchical, sqeuclidean for "
+                             "memo and constrained; the other engines take "
+                             "none)")
+    parser.add_argument("--k-search", choices=["grid", "adaptive"], default="grid",
+                        help="solve every k of the grid, or search the grid "
+                             "with early stopping and refine around the "
+                             "BSS/TSS elbow (see k_selection)")
+    parser.add_argument("--min-gain", type=float, default=5e-4,
+                        help="adaptive search stops when one more region adds "
+                             "less BSS/TSS than this")
+    return parser.parse_args()
+
+
+def label_column(n_clust, floor, floors):
+    # DBF field names are capped at 10 characters. map_render.skater_columns
+    # reads the floor back from the name, so the name has to be exact: whole
+    # thousands may shorten to f<n>k, anything else that does not fit fails.
+    if len(floors) == 1:
+        return f"skater_{n_clust}"
+    name = f"sk{n_clust}_f{floor}"
+    if len(name) > 10 and floor % 1000 == 0:
+        name = f"sk{n_clust}_f{floor // 1000}k"
+    if len(name) > 10:
+        raise ValueError(
+            f"floor {floor} at k = {n_clust} does not fit a 10-character label "
+            f"column; use floors in whole thousands or one floor per run"
+        )
+    return name
+
+
+# -----------------------------------------------------------------------------
+# Worker state: set once per process by the pool initializer so the weights and
+# attribute matrices are shipped to each worker once, not once per task.
+# -----------------------------------------------------------------------------
+_attr_df = None
+_w = None
+_attrs_name = None
+_X_scaled = None
+_adj = None
+_pop = None
+_pop_ceiling = None
+_metric = None
+
+
+def _init_worker(attr_df, w, attrs_name, X_scaled, adj, pop, pop_ceiling,
+                 metric=None):
+    global _attr_df, _w, _attrs_name, _X_scaled, _adj, _pop, _pop_ceiling, _metric
+    _attr_df = attr_df
+    _w = w
+    _attrs_name = attrs_name
+    _X_scaled = X_scaled
+    _adj = adj
+    _pop = pop
+    _pop_ceiling = pop_ceiling
+    _metric = metric
+
+
+def _rss_kb():
+    """(current, peak) resident set size of this process in KB."""
+    try:
+        with open("/proc/self/status") as fh:
+            status = dict(line.split(":", 1) for line in fh)
+        return int(status["VmRSS"].split()[0]), int(status["VmHWM"].split()[0])
+    except OSError:
+        # no procfs: only the lifetime maximum is known (bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak //= 1024 if sys.platform == "darwin" else 1
+        return peak, peak
+
+
+def _task_start():
+    # Writing 5 to clear_refs resets the peak (VmHWM) to the current RSS on
+    # Linux, so the peak read when the task ends is the task's own. Tracing
+    # allocations instead slows the solvers several-fold.
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+    return _rss_kb()[0]
+
+
+def _task_peak_mb(start):
+    """Peak RSS above ``start`` (from _task_start) reached during the task.
+
+    Without procfs this is how far the task raised the process's lifetime
+    peak, a lower bound.
+    """
+    return max(_rss_kb()[1] - start, 0) / 1e3
+
+
+def _tree_kwds(default):
+    # every floor (and every worker) of a sweep reuses the one cached tree
+    return {"metric": _metric or default, "mst_cache": MST_CACHE}
+
+
+def _solve_task(n_clust, floor):
+    rss = _task_start()
+    start = time.perf_counter()
     model = Skater(
-        gdf,
-        w,
-        attrs_name=attrs_name,
+        _attr_df,
+        _w,
+        attrs_name=_attrs_name,
         n_clusters=n_clust,
         floor=floor,
         trace=False,
@@ -99,21 +168,332 @@ for n_clust in n_clusters_range:
         spanning_forest_kwds={}
     )
     model.solve()
+    seconds = time.perf_counter() - start
+    peak = _task_peak_mb(rss)
+
     labels = np.array(model.labels_)
-    gdf[f"skater_{n_clust}"] = labels
+    scores = score_partitions(_X_scaled, labels)[0].iloc[0]
+    row = {
+        "n_clusters": n_clust,
+        "floor": floor,
+        "BSS_TSS": scores["BSS_TSS"],
+        "calinski_harabasz": scores["calinski_harabasz"],
+        "davies_bouldin": scores["davies_bouldin"],
+        "seconds": seconds,
+        "peak_mem_mb": peak,
+    }
+    return [row], [labels]
+
+
+def _solve_hierarchy_task(n_clusters_range, floor):
+    # One pruning pass per floor; seconds are cumulative up to each k and the
+    # peak memory covers the whole pass.
+    rss = _task_start()
+    partitions, seconds = skater_hierarchy(
+        _attr_df[_attrs_name].values,
+        _w,
+        n_clusters_range,
+        floor=floor,
+        islands="increase",
+        spanning_forest_kwds={},
+        **_tree_kwds("manhattan"),
+    )
+    peak = _task_peak_mb(rss)
+    return _score_rows(n_clusters_range, floor, partitions, seconds, peak)
+
+
+def _solve_memo_task(n_clusters_range, floor):
+    # Same inputs as the hierarchical engine; cuts are scored from subtree
+    # sums with the SSD objective
+    rss = _task_start()
+    partitions, seconds = memo_skater(
+        _attr_df[_attrs_name].values,
+        _adj,
+        n_clusters_range,
+        floor=floor,
+        islands="increase",
+        **_tree_kwds("sqeuclidean"),
+    )
+    peak = _task_peak_mb(rss)
+    return _score_rows(n_clusters_range, floor, partitions, seconds, peak)
+
+
+def _solve_constrained_task(n_clusters_range, floor):
+    # Population floor/ceiling on the standardized attributes; one pass per
+    # floor like the hierarchical engine
+    rss = _task_start()
+    partitions, seconds = constrained_skater(
+        _X_scaled,
+        _adj,
+        n_clusters_range,
+        pop=_pop,
+        floor=floor,
+        ceiling=np.inf if _pop_ceiling is None else _pop_ceiling,
+        **_tree_kwds("sqeuclidean"),
+    )
+    peak = _task_peak_mb(rss)
+    return _score_rows(n_clusters_range, floor, partitions, seconds, peak)
+
+
+def _solve_engine_task(n_clusters_range, floor, engine):
+    # Other region_engines on the standardized attributes (Ward's floor is
+    # None: it has none)
+    rss = _task_start()
+    partitions, seconds = ENGINES[engine](_X_scaled, _adj, n_clusters_range,
+                                          floor=-np.inf if floor is None else floor)
+    peak = _task_peak_mb(rss)
+    return _score_rows(n_clusters_range, floor, partitions, seconds, peak)
+
+
+def _solve_ward_task(n_clusters_range, floor):
+    return _solve_engine_task(n_clusters_range, floor, "ward")
+
+
+def _solve_redcap_task(n_clusters_range, floor):
+    return _solve_engine_task(n_clusters_range, floor, "redcap")
+
+
+def _adaptive_task(n_clusters_range, floor, engine, min_gain):
+    # Per-k solves happen only where select_k asks; one-pass engines prune
+    # every integer k once and the search reads that curve
+    if engine == "per-k":
+        solved = {}
+
+        def evaluate(k):
+            solved[k] = _solve_task(k, floor)
+            return solved[k][0][0]["BSS_TSS"]
+    else:
+        k_all = list(range(n_clusters_range[0], n_clusters_range[-1] + 1))
+        rows, labels = ONE_PASS_TASKS[engine](k_all, floor)
+        solved = {row["n_clusters"]: ([row], [lab]) for row, lab in zip(rows, labels)}
+
+        def evaluate(k):
+            return solved[k][0][0]["BSS_TSS"]
+
+    k_best, curve = select_k(evaluate, n_clusters_range, min_gain=min_gain)
+    ks = sorted(curve)
+    selection = {"floor": floor, "engine": engine, "k_selected": k_best,
+                 "BSS_TSS": curve[k_best], "n_evaluated": len(ks)}
+    return ([solved[k][0][0] for k in ks], [solved[k][1][0] for k in ks],
+            selection)
+
+
+def _score_rows(n_clusters_range, floor, partitions, seconds, peak):
+    labels = [partitions[k] for k in n_clusters_range]
+    summary, _ = score_partitions(_X_scaled, np.column_stack(labels))
+    rows = []
+    for n_clust, scores in zip(n_clusters_range, summary.itertuples()):
+        rows.append({
+            "n_clusters": n_clust,
+            "floor": floor,
+            "BSS_TSS": scores.BSS_TSS,
+            "calinski_harabasz": scores.calinski_harabasz,
+            "davies_bouldin": scores.davies_bouldin,
+            "seconds": seconds[n_clust],
+            "peak_mem_mb": peak,
+        })
+    return rows, labels
+
+
+ONE_PASS_TASKS = {
+    "hierarchical": _solve_hierarchy_task,
+    "memo": _solve_memo_task,
+    "constrained": _solve_constrained_task,
+    "ward": _solve_ward_task,
+    "redcap": _solve_redcap_task,
+}
+# the engines whose spanning tree dissimilarity --metric sets (_tree_kwds)
+TREE_ENGINES = {"hierarchical", "memo", "constrained"}
+
+
+def run(gdf=None, adj=None, k_min=75, k_max=90, k_step=5, floors=None,
+        workers=1, engine="hierarchical", pop_ceiling=None, k_search="grid",
+        min_gain=5e-4, metric=None):
+    """Stage entry point: returns the labelled GeoDataFrame and the metrics.
+
+    ``gdf`` / ``adj`` are the SES frame and its Queen adjacency from the
+    previous stages; either is read from disk when not passed in. ``floors``
+    defaults to ``(10,)``; engines without a floor (ward) run and store
+    floor None. With ``engine="constrained"`` the floors and ``pop_ceiling`` count people
+    (``total_pop``) instead of block groups. With ``k_search="adaptive"``
+    each floor runs select_k over the k grid and the picks are saved to
+    skater_k_selection.csv. ``metric`` overrides the engine's spanning tree
+    dissimilarity (see spanning_tree); per-k (spopt's Skater, always
+    manhattan), ward and redcap take none.
+    """
+    if metric is not None and engine not in TREE_ENGINES:
+        raise ValueError(f"engine {engine!r} does not take a metric")
+    if engine in NO_FLOOR:
+        if floors is not None:
+            warnings.warn(f"engine {engine!r} has no size floor; ignoring "
+                          f"floors {list(floors)}")
+        floors = [None]
+    elif floors is None:
+        floors = [10]
+
+    print("="*80)
+    print("SKATER regionalization over range of cluster numbers (Cook only)")
+    print("="*80)
+
+    # 1. Read SES shapefile and restrict to Cook County
+    if gdf is None:
+        shp_path = os.path.join(OUT_DIR, "cook_bg_acs2020_ses.shp")
+        gdf = read_geometry(shp_path)
+    gdf_all = gdf
+    print(f"Total rows in original shapefile: {len(gdf_all)}")
+
+    # Filter to Cook: COUNTYFP == '031' if present, else GEOID prefix
+    if "COUNTYFP" in gdf_all.columns:
+        gdf = gdf_all[gdf_all["COUNTYFP"] == "031"].copy()
+    else:
+        gdf = gdf_all[gdf_all["GEOID"].str.startswith("17031")].copy()
+
+    print(f"Rows in Cook County subset: {len(gdf)}")
+
+    # 2. Choose SES variables using your truncated names
+    candidate_attrs = [
+        "pct_white_",   # % White NH
+        "pct_black_",   # % Black NH
+        "pct_asian_",   # % Asian NH
+        "pct_hispan",   # % Hispanic
+        "median_hh_",   # median HH income
+        "poverty_ra",   # poverty rate
+        "pct_ba_plu",   # % BA+
+        "unemployme",   # unemployment rate
+        "pct_owner",    # % owner
+        "pct_renter",   # % renter
+    ]
+
+    attrs_name = [c for c in candidate_attrs if c in gdf.columns]
+    print("\nUsing these SES variables for clustering:")
+    print(attrs_name)
+
+    # 3. Queen weights for the full Cook subset (cached on disk by 02)
+    if adj is None:
+        print("\nLoading Queen contiguity weights on Cook subset...")
+        adj = queen_adjacency(gdf)
+
+    # 4. Drop rows with NaNs in these columns, then islands (units with no
+    #    neighbors); both are subgraphs of the cached adjacency
+    gdf, adj, n_islands = filter_rows(gdf, adj, attrs_name)
+    print(f"\nRows after dropping NaNs in SES variables: {len(gdf) + n_islands}")
+    if n_islands:
+        print(f"Rows after dropping {n_islands} island(s): {len(gdf)}")
+    else:
+        print("No islands found.")
+    w = to_w(adj)
+    print("Done. Number of regions with neighbors:", len(w.neighbors))
+
+    # 5. Standardize SES data
+    X = gdf[attrs_name].to_numpy()
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # 6. Run SKATER over the (k, floor) grid, streaming metrics as solves finish
+    n_clusters_range = list(range(k_min, k_max + 1, k_step))
+    floors = list(dict.fromkeys(floors))
+    tasks = [(k, f) for f in floors for k in n_clusters_range]
+    # fail before solving if a floor cannot be written as a label column
+    for k, f in tasks:
+        label_column(k, f, floors)
+    if k_search == "adaptive":
+        solve = _adaptive_task
+        jobs = [(n_clusters_range, f, engine, min_gain) for f in floors]
+    elif engine in ONE_PASS_TASKS:
+        solve, jobs = ONE_PASS_TASKS[engine], [(n_clusters_range, f) for f in floors]
+    else:
+        solve, jobs = _solve_task, tasks
+    if k_search == "adaptive":
+        print(f"\nSearching k in [{k_min}, {k_max}] from the grid {n_clusters_range} "
+              f"(floor = {floors}) as {len(jobs)} {engine} job(s) "
+              f"with {workers} worker(s)")
+    else:
+        print(f"\nSolving {len(tasks)} SKATER problems "
+              f"(k = {n_clusters_range}, floor = {floors}) "
+              f"as {len(jobs)} {engine} job(s) with {workers} worker(s)")
+
+    metrics_path = os.path.join(OUT_DIR, "skater_metrics_60_90.csv")
+    # Skater only needs the attribute columns, so keep geometry out of the pool
+    pop = gdf["total_pop"].to_numpy() if "total_pop" in gdf.columns else None
+    init_args = (pd.DataFrame(gdf[attrs_name]), w, attrs_name, X_scaled,
+                 adj, pop, pop_ceiling, metric)
+    partitions = {}
+    all_rows = []
+    selections = []
+
+    with open(metrics_path, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=METRIC_FIELDS)
+        writer.writeheader()
+        fh.flush()
+
+        def record(rows, labels, selection=None):
+            if selection is not None:
+                selections.append(selection)
+                print(f"  floor = {selection['floor']}: selected k = "
+                      f"{selection['k_selected']} after {selection['n_evaluated']} "
+                      f"evaluations")
+            for row, lab in zip(rows, labels):
+                partitions[(row["n_clusters"], row["floor"])] = lab
+                all_rows.append(row)
+                writer.writerow(row)
+                print(f"  k = {row['n_clusters']}, floor = {row['floor']}: "
+                      f"BSS/TSS = {row['BSS_TSS']:.3f} "
+                      f"({row['seconds']:.1f}s, peak {row['peak_mem_mb']:.1f} MB)")
+            fh.flush()
+
+        if workers <= 1:
+            _init_worker(*init_args)
+            for job in jobs:
+                record(*solve(*job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_worker,
+                                     initargs=init_args) as pool:
+                futures = [pool.submit(solve, *job) for job in jobs]
+                for future in as_completed(futures):
+                    record(*future.result())
+
+    # 7. Save metrics + clusters (label columns in grid order, not finish order)
+    print(f"\nSaved metrics to: {metrics_path}")
+    for n_clust, floor in sorted(partitions, key=lambda t: (floors.index(t[1]), t[0])):
+        gdf[label_column(n_clust, floor, floors)] = partitions[(n_clust, floor)]
+
+    selection_path = os.path.join(OUT_DIR, "skater_k_selection.csv")
+    if os.path.exists(selection_path):
+        os.remove(selection_path)          # stale pick from an earlier search
+    if selections:
+        selections.sort(key=lambda sel: floors.index(sel["floor"]))
+        pd.DataFrame(selections).to_csv(selection_path, index=False)
+        print(f"Saved k selection to: {selection_path}")
+
+    out_shp = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")
+    gdf.to_file(out_shp)
+    print(f"Saved clustered GeoDataFrame to: {out_shp}")
+
+    # 8. Append every partition to the results store (full indicator names)
+    blocks = gdf[["GEOID"] + [c for c in SHORT_NAMES if c in gdf.columns] + ["geometry"]]
+    write_blocks(blocks.rename(columns=SHORT_NAMES))
+    rows = sorted(all_rows, key=lambda r: (floors.index(r["floor"]), r["n_clusters"]))
+    append_runs(
+        np.column_stack([partitions[(r["n_clusters"], r["floor"])] for r in rows]),
+        [{"k": r["n_clusters"], "floor": r["floor"], "engine": engine,
+          "k_search": k_search, "pop_ceiling": pop_ceiling, "metric": metric,
+          "scaled": engine in SCALED, "BSS_TSS": r["BSS_TSS"]}
+         for r in rows],
+    )
+    print(f"Appended {len(rows)} run(s) to the results store: {RESULTS_DIR}")
+
+    print("\nDone.")
+    return gdf, pd.DataFrame(all_rows, columns=METRIC_FIELDS)
 
-    bss, tss, ratio = compute_bss_tss(X_scaled, labels)
-    print(f"  BSS/TSS: {ratio:.3f}")
-    results.append({"n_clusters": n_clust, "BSS_TSS": ratio})
 
-# 7. Save metrics + clusters
-metrics_df = pd.DataFrame(results)
-metrics_path = os.path.join(OUT_DIR, "skater_metrics_60_90.csv")
-metrics_df.to_csv(metrics_path, index=False)
-print(f"\nSaved metrics to: {metrics_path}")
+def main():
+    args = parse_args()
+    run(k_min=args.k_min, k_max=args.k_max, k_step=args.k_step,
+        floors=args.floors, workers=args.workers, engine=args.engine,
+        pop_ceiling=args.pop_ceiling, k_search=args.k_search,
+        min_gain=args.min_gain, metric=args.metric)
 
-out_shp = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")
-gdf.to_file(out_shp)
-print(f"Saved clustered GeoDataFrame to: {out_shp}")
 
-print("\nDone.")
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,27 @@
 import os
-import geopandas as gpd
-import pandas as pd
+from results_store import read_partition, find_run
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
-shp = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")  
 
-gdf = gpd.read_file(shp)
-col = "skater_90"
 
-sizes = gdf.groupby(col).size().reset_index(name="n_bgs")
-sizes["share_of_all"] = sizes["n_bgs"] / len(gdf)
-print(sizes.describe())
+def run(k=None, floor=None):
+    """Stage entry point: returns cluster sizes for the stored k-region run.
 
-sizes.to_csv(os.path.join(OUT_DIR, "cluster_sizes_90.csv"), index=False)
+    ``k=None`` takes the largest k of the latest sweep (see find_run).
+    """
+    k = int(find_run(k, floor)["k"])
+    col = f"skater_{k}"
+    gdf = read_partition(k, floor=floor, columns=["GEOID"])
+
+    sizes = gdf.groupby(col).size().reset_index(name="n_bgs")
+    sizes["share_of_all"] = sizes["n_bgs"] / len(gdf)
+    sizes.insert(0, "k", k)
+    print(sizes.describe())
+
+    sizes.to_csv(os.path.join(OUT_DIR, f"cluster_sizes_{k}.csv"), index=False)
+    return sizes
+
+
+if __name__ == "__main__":
+    run()
@@ -1,20 +1,25 @@
 import os
-import geopandas as gpd
-import pandas as pd
+from results_store import read_partition, find_run
+from acs_ingest import SES_INDICATORS
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
-shp = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")  
 
-gdf = gpd.read_file(shp)
-col = "skater_90"
 
-ses_vars = [
-    "pct_white_", "pct_black_", "pct_asian_", "pct_hispan",
-    "median_hh_", "poverty_ra", "pct_ba_plu",
-    "unemployme", "pct_owner", "pct_renter",
-]
+def run(k=None, floor=None):
+    """Stage entry point: returns SES means per cluster of the stored k-region run.
 
-means = gdf.groupby(col)[ses_vars].mean().reset_index()
-means.to_csv(os.path.join(OUT_DIR, "cluster_means_90.csv"), index=False)
-print(means.head())
+    ``k=None`` takes the largest k of the latest sweep (see find_run).
+    """
+    k = int(find_run(k, floor)["k"])
+    col = f"skater_{k}"
+    gdf = read_partition(k, floor=floor, columns=["GEOID"] + SES_INDICATORS)
+
+    means = gdf.groupby(col)[SES_INDICATORS].mean().reset_index()
+    means.to_csv(os.path.join(OUT_DIR, f"cluster_means_{k}.csv"), index=False)
+    print(means.head())
+    return means
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from results_store import read_blocks, read_labels, list_runs
+from region_geometry import block_group_geometry
+from weights_cache import queen_adjacency
+from acs_ingest import SES_INDICATORS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+
+# -----------------------------------------------------------------------------
+# Region summary for every stored run
+#
+# The label matrix (BG x run) is turned into one sparse membership matrix A
+# with a row per (run, region): region r of run j is row offset_j + r. Then
+# A @ [x, x^2, pop * x, ...] gives the per-region sums of every indicator for
+# every k in one product, and sizes, population, area and perimeter come from
+# the same product. Perimeters subtract twice the Queen edges that stay inside
+# a region (see region_geometry), evaluated for all runs at once.
+#
+# Output is long: one row per run, region, variable and statistic. Region
+# measures use variable = "region"; indicators carry mean, pop_weighted_mean
+# and std (ddof = 1, like pandas). Missing values are left out per indicator.
+# -----------------------------------------------------------------------------
+
+
+def run():
+    """Stage entry point: returns the long region summary for all stored runs."""
+    print("="*80)
+    print("Region summary across all stored partitions")
+    print("="*80)
+
+    runs = list_runs()
+    blocks = read_blocks()
+    labels = read_labels(runs["run"]).to_numpy().astype(np.int64)
+    n, m = labels.shape
+    print(f"Block groups: {n}, stored runs: {m}")
+
+    # 1. Membership matrix: one row per (run, region)
+    n_regions = labels.max(axis=0) + 1
+    offset = np.concatenate([[0], np.cumsum(n_regions)[:-1]])
+    group = labels + offset
+    A = sparse.csr_matrix(
+        (np.ones(n * m), (group.T.ravel(), np.tile(np.arange(n), m))),
+        shape=(int(n_regions.sum()), n),
+    )
+
+    # 2. Per-BG columns summed in one product; indicators are centred so the
+    #    sums of squares do not cancel
+    indicators = [c for c in SES_INDICATORS if c in blocks.columns]
+    X = blocks[indicators].to_numpy(dtype=float)
+    valid = ~np.isnan(X)
+    Xc = np.where(valid, X - np.nanmean(X, axis=0), 0.0)
+    pop = blocks["total_pop"].fillna(0).to_numpy(dtype=float)
+    base = block_group_geometry(blocks, queen_adjacency(blocks))
+    sums = A @ np.column_stack([
+        np.ones(n), pop, base["area"], base["perimeter"],
+        valid, Xc, Xc ** 2, pop[:, None] * valid, pop[:, None] * Xc,
+    ])
+    d = len(indicators)
+    size, total_pop, area, perimeter = sums[:, :4].T
+    cnt, s, q, wcnt, ws = (sums[:, 4 + i * d:4 + (i + 1) * d] for i in range(5))
+
+    # 3. Boundaries shared inside a region, for every run at once
+    gi, gj = group[base["edge_i"]], group[base["edge_j"]]
+    inside = gi == gj
+    edge_len = np.broadcast_to(base["edge_len"][:, None], gi.shape)
+    perimeter -= 2 * np.bincount(gi[inside], weights=edge_len[inside],
+                                 minlength=A.shape[0])
+
+    # 4. Long table
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centre = np.nanmean(X, axis=0)
+        region = pd.DataFrame({
+            "n_bgs": size,
+            "share_of_all": size / n,
+            "total_pop": total_pop,
+            "area_sq_km": area / 1e6,
+            "perimeter_km": perimeter / 1e3,
+            "polsby_popper": 4 * np.pi * area / perimeter ** 2,
+            "compactness": np.where(area > 0, perimeter ** 2 / area, 0.0),
+        })
+        stats = {
+            "mean": s / cnt + centre,
+            "pop_weighted_mean": ws / wcnt + centre,
+            "std": np.sqrt(np.maximum(q - s ** 2 / cnt, 0) / (cnt - 1)),
+        }
+
+    keys = pd.DataFrame({
+        "run": np.repeat(runs["run"].to_numpy(), n_regions),
+        "k": np.repeat(runs["k"].to_numpy(), n_regions),
+        "floor": np.repeat(runs["floor"].to_numpy(), n_regions),
+        "engine": np.repeat(runs["engine"].to_numpy(), n_regions),
+        "region": np.concatenate([np.arange(r) for r in n_regions]),
+    })
+    occupied = size > 0                  # label gaps leave empty rows
+    keys = keys[occupied].reset_index(drop=True)
+    id_vars = list(keys.columns)
+    parts = [keys.join(region[occupied].reset_index(drop=True))
+             .melt(id_vars=id_vars, var_name="statistic").assign(variable="region")]
+    for stat, values in stats.items():
+        frame = keys.join(pd.DataFrame(values[occupied], columns=indicators))
+        parts.append(frame.melt(id_vars=id_vars, var_name="variable")
+                     .assign(statistic=stat))
+    summary = pd.concat(parts, ignore_index=True)
+    summary = summary[id_vars + ["variable", "statistic", "value"]]
+
+    out_path = os.path.join(OUT_DIR, "region_summary.csv")
+    summary.to_csv(out_path, index=False)
+    print(f"{len(keys)} regions over {m} run(s), {len(summary)} rows")
+    print(f"Saved: {out_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,121 @@
+import os
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from sklearn.preprocessing import StandardScaler
+from acs_ingest import build_indicators, SES_INDICATORS
+from weights_cache import queen_adjacency, filter_rows, to_w
+from skater_hierarchy import skater_hierarchy
+from partition_metrics import score_partitions
+from geo_io import read_geometry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHAPE_DIR = os.path.join(BASE_DIR, "shapefiles")
+OUT_DIR = os.path.join(BASE_DIR, "output")
+STATE_FP = "17"
+SHP_PATH = os.path.join(SHAPE_DIR, "tl_2020_17_bg.shp")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extraction, Queen weights and SKATER for many counties"
+    )
+    parser.add_argument("--counties", nargs="+", default=["031"],
+                        help='3-digit COUNTYFP codes, or "all"')
+    parser.add_argument("--k", type=int, nargs="+", default=[75, 80, 85, 90],
+                        help="numbers of regions to snapshot in every county")
+    parser.add_argument("--floor", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--tag", default="counties",
+                        help="suffix for the merged output files")
+    return parser.parse_args()
+
+
+def list_counties():
+    attrs = gpd.read_file(SHP_PATH, columns=["COUNTYFP"], ignore_geometry=True)
+    return sorted(attrs["COUNTYFP"].unique())
+
+
+def regionalize_county(countyfp, master, ks, floor):
+    """Weights -> SKATER for one county's indicator rows; returns (gdf, metrics)."""
+    gdf = read_geometry(SHP_PATH, where=f"COUNTYFP = '{countyfp}'")
+    gdf = gdf.merge(master[["GEOID", "total_pop"] + SES_INDICATORS],
+                    on="GEOID", how="left").reset_index(drop=True)
+
+    gdf, adj, _ = filter_rows(gdf, queen_adjacency(gdf), SES_INDICATORS)
+
+    X = gdf[SES_INDICATORS].to_numpy()
+    with warnings.catch_warnings():
+        # small counties cannot reach every k at this floor; they keep the
+        # last feasible partition and report the k they actually reached
+        warnings.simplefilter("ignore")
+        partitions, seconds = skater_hierarchy(X, to_w(adj), ks, floor=floor)
+
+    summary, _ = score_partitions(StandardScaler().fit_transform(X),
+                                  np.column_stack([partitions[k] for k in ks]))
+    metrics = pd.DataFrame({
+        "COUNTYFP": countyfp,
+        "n_bgs": len(gdf),
+        "k_requested": ks,
+        "n_clusters": summary["n_clusters"],
+        "BSS_TSS": summary["BSS_TSS"],
+        "seconds": [seconds[k] for k in ks],
+    })
+    for k in ks:
+        # county-qualified ids, e.g. "031-12"
+        gdf[f"region_{k}"] = [f"{countyfp}-{lab}" for lab in partitions[k]]
+    return gdf, metrics
+
+
+def main():
+    args = parse_args()
+
+    print("="*80)
+    print("SKATER regionalization by county")
+    print("="*80)
+
+    counties = list_counties() if args.counties == ["all"] else args.counties
+    ks = sorted(set(args.k))
+    print(f"Counties: {len(counties)}, k = {ks}, floor = {args.floor}, "
+          f"workers = {args.workers}")
+
+    # One pass over the statewide ACS CSVs; workers only get their county's rows
+    prefixes = (STATE_FP,) if args.counties == ["all"] else \
+        tuple(STATE_FP + c for c in counties)
+    master = build_indicators(prefixes=prefixes).reset_index()
+    county_of = master["GEOID"].str[2:5]
+
+    parts, metrics = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(regionalize_county, c, master[county_of == c],
+                               ks, args.floor): c
+                   for c in counties}
+        for future in as_completed(futures):
+            countyfp = futures[future]
+            gdf, m = future.result()
+            parts.append(gdf)
+            metrics.append(m)
+            print(f"  county {countyfp}: {len(gdf)} BGs, "
+                  f"BSS/TSS at k={ks[-1]} = {m['BSS_TSS'].iloc[-1]:.3f}")
+
+    merged = pd.concat(parts, ignore_index=True).sort_values("GEOID")
+    merged = gpd.GeoDataFrame(merged, geometry="geometry", crs=parts[0].crs)
+    metrics_df = pd.concat(metrics, ignore_index=True).sort_values(
+        ["COUNTYFP", "k_requested"])
+
+    metrics_path = os.path.join(OUT_DIR, f"skater_metrics_{args.tag}.csv")
+    metrics_df.to_csv(metrics_path, index=False)
+    print(f"\nSaved metrics to: {metrics_path}")
+
+    out_gpkg = os.path.join(OUT_DIR, f"il_bg_skater_{args.tag}.gpkg")
+    merged.to_file(out_gpkg)
+    print(f"Saved merged regions to: {out_gpkg}")
+
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
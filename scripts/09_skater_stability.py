@@ -0,0 +1,236 @@
+import os
+import argparse
+import warnings
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import StandardScaler
+from acs_ingest import SES_INDICATORS, SHORT_NAMES
+from region_engines import run_engine, SCALED
+from results_store import find_run, read_labels, run_params
+from weights_cache import queen_adjacency, filter_rows
+from geo_io import read_geometry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+SES_SHP = os.path.join(OUT_DIR, "cook_bg_acs2020_ses.shp")
+MOE_CSV = os.path.join(OUT_DIR, "cook_bg_acs2020_moe.csv")
+
+# an ACS MOE is a 90% interval half-width
+Z90 = 1.645
+
+# -----------------------------------------------------------------------------
+# Bootstrap stability
+#
+# Every replicate draws X ~ N(estimate, (MOE / 1.645)^2) per cell (missing
+# MOEs perturb nothing; percentages are clipped to [0, 100] and incomes at 0)
+# and reruns the regionalization for all k. The reference is the stored run
+# for each k in the results store (the published regions by default), and
+# every replicate is solved like it: same engine, floor, metric and input
+# matrix (standardized with the point estimates' mean and scale for the
+# engines 03 runs on standardized attributes). Only Queen neighbour pairs are
+# tracked: for each k an int32 vector over the upper-triangle Queen edges
+# counts the replicates in which both ends share a region, so memory is
+# O(edges) and workers return one (k, edges) count array per batch.
+#
+# A BG's stability at k is the mean over its Queen neighbours of the share of
+# replicates that agree with the unperturbed partition about that pair
+# (together when the reference has them together, apart otherwise).
+# -----------------------------------------------------------------------------
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bootstrap SKATER stability under ACS margins of error"
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[80, 90])
+    parser.add_argument("--floor", type=int, default=None,
+                        help="floor of the stored reference runs (default: "
+                             "that of the latest run with each k)")
+    parser.add_argument("--n-boot", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=2020)
+    parser.add_argument("--engine", default=None,
+                        choices=["hierarchical", "per-k", "memo", "constrained",
+                                 "ward", "redcap"],
+                        help="engine of the stored reference runs (default: "
+                             "that of the latest run with each k); spopt's "
+                             "SKATER takes hours for hundreds of replicates")
+    return parser.parse_args()
+
+
+# Worker state, set once per process by the pool initializer
+_X = None
+_sd = None
+_lo = None
+_hi = None
+_center = None
+_scale = None
+_edges = None
+_ks = None
+_solve = None
+
+
+def _init_worker(X, sd, lo, hi, center, scale, edges, ks, solve):
+    global _X, _sd, _lo, _hi, _center, _scale, _edges, _ks, _solve
+    _X, _sd, _lo, _hi = X, sd, lo, hi
+    _center, _scale, _edges, _ks, _solve = center, scale, edges, ks, solve
+
+
+def _regionalize(X):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        labels, _ = _solve((X - _center) / _scale)
+    return labels
+
+
+def _boot_task(seeds):
+    """Co-assignment counts over the Queen edges for a batch of replicates."""
+    i, j = _edges
+    counts = np.zeros((len(_ks), len(i)), dtype=np.int32)
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        X = np.clip(_X + rng.standard_normal(_X.shape) * _sd, _lo, _hi)
+        labels = _regionalize(X)
+        for row, k in enumerate(_ks):
+            counts[row] += labels[k][i] == labels[k][j]
+    return counts, len(seeds)
+
+
+def run(gdf=None, ks=(80, 90), floor=None, n_boot=200, workers=1, seed=2020,
+        engine=None):
+    """Stage entry point: returns per-BG stability scores for every k.
+
+    The reference partitions are the latest stored runs with each k (and
+    ``floor`` / ``engine`` when given); they must share one engine setup.
+    """
+    print("="*80)
+    print("SKATER stability under ACS margins of error (Cook only)")
+    print("="*80)
+
+    # 1. SES frame plus the MOEs written by 01_extract_and_merge_acs.py
+    if gdf is None:
+        gdf = read_geometry(SES_SHP)
+    if "COUNTYFP" in gdf.columns:
+        gdf = gdf[gdf["COUNTYFP"] == "031"].copy()
+    else:
+        gdf = gdf[gdf["GEOID"].str.startswith("17031")].copy()
+    moe = pd.read_csv(MOE_CSV, dtype={"GEOID": str})
+    # shapefile (10-character) names; the MOE CSV uses the full names
+    attrs = [name[:10] for name in SES_INDICATORS if name[:10] in gdf.columns]
+    moe_cols = [f"{SHORT_NAMES[a]}_moe" for a in attrs]
+
+    # 2. Same row filtering as 03_skater_range.py
+    gdf, adj, _ = filter_rows(gdf, queen_adjacency(gdf), attrs)
+    print(f"Block groups: {len(gdf)}, Queen edges: {adj.nnz // 2}")
+
+    X = gdf[attrs].to_numpy(dtype=float)
+    sd = (gdf[["GEOID"]].merge(moe, on="GEOID", how="left")[moe_cols]
+          .to_numpy(dtype=float) / Z90)
+    sd = np.nan_to_num(sd)
+    lo = np.zeros(len(attrs))
+    hi = np.where([a.startswith("median") for a in attrs], np.inf, 100.0)
+
+    upper = sparse.triu(adj, k=1).tocoo()
+    edges = (upper.row, upper.col)
+    ks = sorted(ks)
+
+    # 3. Reference partitions from the results store, and the solver that
+    #    produced them
+    runs = [find_run(k, floor, engine) for k in ks]
+    setup = {(p["engine"], p["floor"], p.get("metric"), p.get("pop_ceiling"))
+             for p in map(run_params, runs)}
+    if len(setup) > 1:
+        raise ValueError(f"stored runs for k = {ks} were solved differently "
+                         f"{sorted(setup, key=str)}; pass --engine / --floor")
+    engine, floor, metric, ceiling = setup.pop()
+    stored = read_labels([r["run"] for r in runs]).reindex(gdf["GEOID"])
+    if stored.isna().any().any():
+        raise ValueError("stored runs do not cover these block groups; "
+                         "rerun 03_skater_range.py")
+    reference = {k: stored[r["run"]].to_numpy().astype(np.int64)
+                 for k, r in zip(ks, runs)}
+    print(f"Reference runs {[r['run'] for r in runs]}: engine = {engine}, "
+          f"floor = {floor}, metric = {metric or 'default'}")
+
+    if engine in SCALED:
+        scaler = StandardScaler().fit(X)
+        center, scale = scaler.mean_, scaler.scale_
+    else:
+        center, scale = np.zeros(len(attrs)), np.ones(len(attrs))
+    pop = gdf["total_pop"].to_numpy(dtype=float) if "total_pop" in gdf.columns else None
+    solve = partial(run_engine, engine, adj=adj, n_clusters_list=ks, floor=floor,
+                    pop=pop, metric=metric, ceiling=ceiling)
+    init_args = (X, sd, lo, hi, center, scale, edges, ks, solve)
+    _init_worker(*init_args)
+
+    # 4. Replicates, in batches across the pool
+    seeds = np.random.SeedSequence(seed).spawn(n_boot)
+    n_batches = max(1, min(n_boot, 4 * workers))
+    batches = [b for b in np.array_split(np.array(seeds, dtype=object), n_batches) if len(b)]
+    print(f"\nRunning {n_boot} {engine} replicates for k = {ks} "
+          f"in {len(batches)} batch(es) with {workers} worker(s)")
+
+    counts = np.zeros((len(ks), len(edges[0])), dtype=np.int64)
+    done = 0
+    if workers <= 1:
+        for batch in batches:
+            c, m = _boot_task(batch)
+            counts += c
+            done += m
+            print(f"  {done}/{n_boot} replicates")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(_boot_task, batch) for batch in batches]
+            for future in as_completed(futures):
+                c, m = future.result()
+                counts += c
+                done += m
+                print(f"  {done}/{n_boot} replicates")
+
+    # 5. Co-assignment frequencies on Queen edges and per-BG stability
+    i, j = edges
+    geoids = gdf["GEOID"].to_numpy()
+    n = len(gdf)
+    coassign, stability = [], {"GEOID": geoids}
+    for row, k in enumerate(ks):
+        freq = counts[row] / n_boot
+        ref = reference[k]
+        same = ref[i] == ref[j]
+        agree = np.where(same, freq, 1 - freq)
+        deg = np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+        total = np.bincount(i, weights=agree, minlength=n) + np.bincount(j, weights=agree, minlength=n)
+        stability[f"region_{k}"] = ref
+        stability[f"stability_{k}"] = total / np.maximum(deg, 1)
+        coassign.append(pd.DataFrame({
+            "k": k, "GEOID": geoids[i], "neighbor_GEOID": geoids[j],
+            "same_in_reference": same, "co_assigned": freq,
+        }))
+        print(f"  k = {k}: mean BG stability {stability[f'stability_{k}'].mean():.3f}, "
+              f"{(freq[same] < 0.5).mean():.1%} of within-region edges split in most replicates")
+
+    stab_df = pd.DataFrame(stability)
+    coassign_df = pd.concat(coassign, ignore_index=True)
+    coassign_df["n_boot"] = n_boot
+
+    stab_out = os.path.join(OUT_DIR, "skater_stability.csv")
+    coassign_out = os.path.join(OUT_DIR, "skater_coassignment.parquet")
+    stab_df.to_csv(stab_out, index=False)
+    coassign_df.to_parquet(coassign_out, index=False)
+    print(f"\nSaved per-BG stability to: {stab_out}")
+    print(f"Saved co-assignment edge list to: {coassign_out}")
+    print("\nDone.")
+    return stab_df
+
+
+def main():
+    args = parse_args()
+    run(ks=args.k, floor=args.floor, n_boot=args.n_boot, workers=args.workers,
+        seed=args.seed, engine=args.engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,95 @@
 import os
-import geopandas as gpd
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import numpy as np
+from geo_io import read_geometry
+from weights_cache import queen_adjacency
+from region_geometry import block_group_geometry, region_shape_stats
+from map_render import skater_columns
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
 
-print("Creating Cluster Size and Compactness Analysis...")
-
-# Read shapefile
-shp_path = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")
-gdf = gpd.read_file(shp_path)
-
-# Calculate cluster statistics
-cluster_stats = []
-
-for cluster_id in sorted(gdf["skater_90"].unique()):
-    cluster_geom = gdf[gdf["skater_90"] == cluster_id]
-    
-    # Number of block groups
-    n_bgs = len(cluster_geom)
-    
-    # Total area (in square meters, convert to square km)
-    total_area = cluster_geom.geometry.area.sum() / 1_000_000
-    
-    # Compactness: perimeter^2 / area (lower is more compact)
-    # Use union to get overall cluster shape
-    union_geom = cluster_geom.geometry.unary_union
-    perimeter = union_geom.length
-    area = union_geom.area
-    compactness = (perimeter ** 2) / area if area > 0 else 0
-    
-    # Average SES indicators
-    avg_poverty = cluster_geom["poverty_ra"].mean()
-    avg_income = cluster_geom["median_hh_"].mean()
-    
-    cluster_stats.append({
-        "cluster_id": cluster_id,
-        "n_block_groups": n_bgs,
-        "area_sq_km": total_area,
-        "compactness": compactness,
-        "avg_poverty_rate": avg_poverty,
-        "avg_median_income": avg_income
-    })
-
-stats_df = pd.DataFrame(cluster_stats)
-
-# Create multi-panel figure
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-
-# 1. Cluster size distribution (already have this but add to comprehensive view)
-axes[0, 0].hist(stats_df["n_block_groups"], bins=20, edgecolor="black", alpha=0.7)
-axes[0, 0].set_xlabel("Block Groups per Cluster", fontsize=11)
-axes[0, 0].set_ylabel("Frequency", fontsize=11)
-axes[0, 0].set_title("Cluster Size Distribution", fontsize=12)
-axes[0, 0].grid(True, alpha=0.3)
-
-# 2. Area distribution
-axes[0, 1].hist(stats_df["area_sq_km"], bins=20, edgecolor="black", alpha=0.7, color="green")
-axes[0, 1].set_xlabel("Area (sq km)", fontsize=11)
-axes[0, 1].set_ylabel("Frequency", fontsize=11)
-axes[0, 1].set_title("Cluster Area Distribution", fontsize=12)
-axes[0, 1].grid(True, alpha=0.3)
-
-# 3. Size vs Compactness
-scatter = axes[1, 0].scatter(stats_df["n_block_groups"], stats_df["compactness"], 
-                             c=stats_df["avg_poverty_rate"], cmap="RdYlGn_r", 
-                             s=100, alpha=0.6, edgecolors="black", linewidth=0.5)
-axes[1, 0].set_xlabel("Block Groups per Cluster", fontsize=11)
-axes[1, 0].set_ylabel("Compactness Index", fontsize=11)
-axes[1, 0].set_title("Cluster Size vs Compactness (color = poverty rate)", fontsize=12)
-axes[1, 0].grid(True, alpha=0.3)
-cbar = plt.colorbar(scatter, ax=axes[1, 0])
-cbar.set_label("Avg Poverty Rate (%)", fontsize=10)
-
-# 4. Income vs Poverty by cluster
-scatter2 = axes[1, 1].scatter(stats_df["avg_median_income"], stats_df["avg_poverty_rate"],
-                              s=stats_df["n_block_groups"]*5, alpha=0.6, 
-                              edgecolors="black", linewidth=0.5, c="coral")
-axes[1, 1].set_xlabel("Avg Median Income ($)", fontsize=11)
-axes[1, 1].set_ylabel("Avg Poverty Rate (%)", fontsize=11)
-axes[1, 1].set_title("Income vs Poverty by Cluster (size = # block groups)", fontsize=12)
-axes[1, 1].grid(True, alpha=0.3)
-
-plt.suptitle("Cluster Spatial and Socioeconomic Characteristics (k=90)", fontsize=14, y=0.995)
-plt.tight_layout()
-plt.savefig(os.path.join(OUT_DIR, "cluster_spatial_analysis.png"), dpi=300, bbox_inches="tight")
-print(f"Saved: {os.path.join(OUT_DIR, 'cluster_spatial_analysis.png')}")
-
-# Save statistics to CSV
-stats_df.to_csv(os.path.join(OUT_DIR, "cluster_spatial_stats.csv"), index=False)
-print(f"Saved: {os.path.join(OUT_DIR, 'cluster_spatial_stats.csv')}")
+
+def run(gdf=None, floor=None):
+    """Stage entry point: returns per-cluster spatial stats for every k at ``floor``."""
+    print("Creating Cluster Size and Compactness Analysis...")
+
+    # Read shapefile
+    shp_path = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")
+    if gdf is None:
+        gdf = read_geometry(shp_path)
+
+    # Calculate cluster statistics for every stored k: BGs are projected to an
+    # equal-area CRS once and regions are measured from per-BG sums (see
+    # region_geometry), so no per-cluster filtering or union is needed
+    label_cols = skater_columns(gdf, floor)
+    base = block_group_geometry(gdf, queen_adjacency(gdf))
+
+    per_k = []
+    for k, col in label_cols.items():
+        stats = region_shape_stats(base, gdf[col].to_numpy())
+        # Average SES indicators
+        means = gdf.groupby(col)[["poverty_ra", "median_hh_"]].mean()
+        stats["avg_poverty_rate"] = means["poverty_ra"].to_numpy()
+        stats["avg_median_income"] = means["median_hh_"].to_numpy()
+        stats.insert(0, "k", k)
+        per_k.append(stats)
+    stats_df = pd.concat(per_k, ignore_index=True)
+
+    # The figure shows the largest k
+    plot_k = stats_df["k"].max()
+    plot_df = stats_df[stats_df["k"] == plot_k]
+
+    # Create multi-panel figure
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+
+    # 1. Cluster size distribution (already have this but add to comprehensive view)
+    axes[0, 0].hist(plot_df["n_block_groups"], bins=20, edgecolor="black", alpha=0.7)
+    axes[0, 0].set_xlabel("Block Groups per Cluster", fontsize=11)
+    axes[0, 0].set_ylabel("Frequency", fontsize=11)
+    axes[0, 0].set_title("Cluster Size Distribution", fontsize=12)
+    axes[0, 0].grid(True, alpha=0.3)
+
+    # 2. Area distribution
+    axes[0, 1].hist(plot_df["area_sq_km"], bins=20, edgecolor="black", alpha=0.7, color="green")
+    axes[0, 1].set_xlabel("Area (sq km)", fontsize=11)
+    axes[0, 1].set_ylabel("Frequency", fontsize=11)
+    axes[0, 1].set_title("Cluster Area Distribution", fontsize=12)
+    axes[0, 1].grid(True, alpha=0.3)
+
+    # 3. Size vs Compactness
+    scatter = axes[1, 0].scatter(plot_df["n_block_groups"], plot_df["compactness"], 
+                                 c=plot_df["avg_poverty_rate"], cmap="RdYlGn_r", 
+                                 s=100, alpha=0.6, edgecolors="black", linewidth=0.5)
+    axes[1, 0].set_xlabel("Block Groups per Cluster", fontsize=11)
+    axes[1, 0].set_ylabel("Compactness Index", fontsize=11)
+    axes[1, 0].set_title("Cluster Size vs Compactness (color = poverty rate)", fontsize=12)
+    axes[1, 0].grid(True, alpha=0.3)
+    cbar = plt.colorbar(scatter, ax=axes[1, 0])
+    cbar.set_label("Avg Poverty Rate (%)", fontsize=10)
+
+    # 4. Income vs Poverty by cluster
+    scatter2 = axes[1, 1].scatter(plot_df["avg_median_income"], plot_df["avg_poverty_rate"],
+                                  s=plot_df["n_block_groups"]*5, alpha=0.6, 
+                                  edgecolors="black", linewidth=0.5, c="coral")
+    axes[1, 1].set_xlabel("Avg Median Income ($)", fontsize=11)
+    axes[1, 1].set_ylabel("Avg Poverty Rate (%)", fontsize=11)
+    axes[1, 1].set_title("Income vs Poverty by Cluster (size = # block groups)", fontsize=12)
+    axes[1, 1].grid(True, alpha=0.3)
+
+    plt.suptitle(f"Cluster Spatial and Socioeconomic Characteristics (k={plot_k})", fontsize=14, y=0.995)
+    plt.tight_layout()
+    plt.savefig(os.path.join(OUT_DIR, "cluster_spatial_analysis.png"), dpi=300, bbox_inches="tight")
+    print(f"Saved: {os.path.join(OUT_DIR, 'cluster_spatial_analysis.png')}")
+
+    # Save statistics to CSV (one row per k and cluster)
+    stats_df.to_csv(os.path.join(OUT_DIR, "cluster_spatial_stats.csv"), index=False)
+    print(f"Saved: {os.path.join(OUT_DIR, 'cluster_spatial_stats.csv')}")
+    plt.close("all")
+    return stats_df
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,174 @@
+import os
+import argparse
+import pandas as pd
+import pyogrio
+from geo_io import read_geometry
+from map_render import skater_columns
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+TILE_DIR = os.path.join(OUT_DIR, "tiles")
+SHP_PATH = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")
+
+SES_COLS = ["poverty_ra", "median_hh_", "pct_ba_plu", "unemployme"]
+
+# -----------------------------------------------------------------------------
+# Vector tile export
+#
+# GDAL's PMTiles driver (through pyogrio) cuts, clips and simplifies every
+# zoom level of the pyramid when the archive is written; SIMPLIFICATION is in
+# tile pixels, so coarser zooms get coarser outlines. The driver writes one
+# layer per archive, so there are two:
+#   block_groups.pmtiles  every BG with GEOID, all skater_<k> labels and the
+#                         mapped SES indicators
+#   regions.pmtiles       the dissolved regions of every k, with k, region
+#                         and n_bgs, so a viewer switches k with a filter
+# index.html is a small MapLibre viewer; serve the folder over HTTP
+# (python -m http.server) since PMTiles are read with range requests.
+# -----------------------------------------------------------------------------
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Export BGs and SKATER regions as PMTiles vector tiles"
+    )
+    parser.add_argument("--min-zoom", type=int, default=8)
+    parser.add_argument("--max-zoom", type=int, default=14)
+    parser.add_argument("--simplification", type=float, default=1.0,
+                        help="simplification tolerance in tile pixels")
+    return parser.parse_args()
+
+
+def write_pmtiles(gdf, path, layer, min_zoom, max_zoom, simplification):
+    if os.path.exists(path):
+        os.remove(path)
+    pyogrio.write_dataframe(
+        gdf.to_crs("EPSG:3857"), path, driver="PMTiles", layer=layer,
+        dataset_options={"MINZOOM": str(min_zoom), "MAXZOOM": str(max_zoom),
+                         "SIMPLIFICATION": str(simplification),
+                         "NAME": layer})
+    print(f"Saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+def run(gdf=None, min_zoom=8, max_zoom=14, simplification=1.0, floor=None):
+    """Stage entry point: PMTiles for BGs and every k's regions plus a viewer."""
+    print("="*80)
+    print("Exporting regionalization results as vector tiles")
+    print("="*80)
+
+    if gdf is None:
+        gdf = read_geometry(SHP_PATH)
+    columns = skater_columns(gdf, floor)
+    os.makedirs(TILE_DIR, exist_ok=True)
+
+    # 1. Block groups with every label, as skater_<k> for the viewer
+    bg = gdf[["GEOID"] + SES_COLS + list(columns.values()) + ["geometry"]]
+    bg = bg.rename(columns={col: f"skater_{k}" for k, col in columns.items()})
+    write_pmtiles(bg, os.path.join(TILE_DIR, "block_groups.pmtiles"),
+                  "block_groups", min_zoom, max_zoom, simplification)
+
+    # 2. Dissolved regions, all k in one layer
+    parts = []
+    for k, col in columns.items():
+        regions = gdf[[col, "geometry"]].dissolve(by=col, as_index=False)
+        regions["n_bgs"] = gdf.groupby(col).size().to_numpy()
+        regions = regions.rename(columns={col: "region"})
+        regions.insert(0, "k", k)
+        parts.append(regions)
+    regions = pd.concat(parts, ignore_index=True)
+    write_pmtiles(regions, os.path.join(TILE_DIR, "regions.pmtiles"),
+                  "regions", min_zoom, max_zoom, simplification)
+
+    # 3. Static viewer
+    minx, miny, maxx, maxy = gdf.to_crs("EPSG:4326").total_bounds
+    html = VIEWER.format(ks=list(columns), k_default=max(columns),
+                         bounds=[[minx, miny], [maxx, maxy]],
+                         min_zoom=min_zoom, max_zoom=max_zoom)
+    out_html = os.path.join(TILE_DIR, "index.html")
+    with open(out_html, "w") as fh:
+        fh.write(html)
+    print(f"Saved: {out_html}")
+    print(f"View with: python -m http.server -d {TILE_DIR}")
+
+
+VIEWER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>SKATER regions</title>
+<link rel="stylesheet" href="https://unpkg.com/maplibre-gl@4/dist/maplibre-gl.css">
+<script src="https://unpkg.com/maplibre-gl@4/dist/maplibre-gl.js"></script>
+<script src="https://unpkg.com/pmtiles@3/dist/pmtiles.js"></script>
+<style>
+  body {{ margin: 0; }}
+  #map {{ position: absolute; top: 0; bottom: 0; width: 100%; }}
+  #panel {{ position: absolute; top: 10px; left: 10px; z-index: 1;
+           background: white; padding: 6px 10px; font: 13px sans-serif; }}
+</style>
+</head>
+<body>
+<div id="panel">k <select id="k"></select></div>
+<div id="map"></div>
+<script>
+const KS = {ks};
+const protocol = new pmtiles.Protocol();
+maplibregl.addProtocol("pmtiles", protocol.tile);
+const base = new URL(".", window.location.href).href;
+
+const map = new maplibregl.Map({{
+  container: "map",
+  bounds: {bounds},
+  style: {{
+    version: 8,
+    sources: {{
+      bg: {{ type: "vector", url: "pmtiles://" + base + "block_groups.pmtiles",
+             minzoom: {min_zoom}, maxzoom: {max_zoom} }},
+      regions: {{ type: "vector", url: "pmtiles://" + base + "regions.pmtiles",
+                  minzoom: {min_zoom}, maxzoom: {max_zoom} }}
+    }},
+    layers: [
+      {{ id: "background", type: "background", paint: {{ "background-color": "#f4f4f4" }} }},
+      {{ id: "bg-fill", type: "fill", source: "bg", "source-layer": "block_groups",
+         paint: {{ "fill-opacity": 0.8 }} }},
+      {{ id: "bg-line", type: "line", source: "bg", "source-layer": "block_groups",
+         paint: {{ "line-color": "#999", "line-width": 0.2 }} }},
+      {{ id: "region-line", type: "line", source: "regions", "source-layer": "regions",
+         paint: {{ "line-color": "#000", "line-width": 1.2 }} }}
+    ]
+  }}
+}});
+
+// 20 qualitative colours, cycled over region labels
+const PALETTE = ["#1f77b4", "#aec7e8", "#ff7f0e", "#ffbb78", "#2ca02c",
+                 "#98df8a", "#d62728", "#ff9896", "#9467bd", "#c5b0d5",
+                 "#8c564b", "#c49c94", "#e377c2", "#f7b6d2", "#7f7f7f",
+                 "#c7c7c7", "#bcbd22", "#dbdb8d", "#17becf", "#9edae5"];
+
+function showK(k) {{
+  const label = ["to-number", ["get", "skater_" + k]];
+  const colour = ["match", ["%", label, PALETTE.length]];
+  PALETTE.forEach((c, i) => colour.push(i, c));
+  colour.push("#ccc");
+  map.setPaintProperty("bg-fill", "fill-color", colour);
+  map.setFilter("region-line", ["==", ["get", "k"], k]);
+}}
+
+const select = document.getElementById("k");
+KS.forEach(k => select.add(new Option(k, k)));
+select.value = {k_default};
+select.onchange = () => showK(Number(select.value));
+map.on("load", () => showK({k_default}));
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    args = parse_args()
+    run(min_zoom=args.min_zoom, max_zoom=args.max_zoom,
+        simplification=args.simplification)
+
+
+if __name__ == "__main__":
+    main()
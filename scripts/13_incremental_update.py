@@ -0,0 +1,253 @@
+import os
+import time
+import argparse
+import warnings
+from functools import partial
+import numpy as np
+import pandas as pd
+from scipy.sparse import csgraph as cg
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+from region_engines import run_engine, SCALED, NO_FLOOR
+from partition_metrics import score_partitions
+from results_store import (read_blocks, read_labels, list_runs, write_blocks,
+                           append_runs, run_params, RESULTS_DIR)
+from acs_ingest import SES_INDICATORS, SHORT_NAMES
+from weights_cache import queen_adjacency, subgraph, filter_rows
+from geo_io import read_geometry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+SES_SHP = os.path.join(OUT_DIR, "cook_bg_acs2020_ses.shp")
+
+# -----------------------------------------------------------------------------
+# Incremental re-regionalization
+#
+# A new vintage (or boundary file) is diffed against the block groups in the
+# results store. A BG is changed when it is new, its geometry differs, or an
+# indicator moved by more than `tolerance` (relative). For every stored
+# (k, floor) the regions holding a changed BG, a removed BG or a neighbour of
+# a new BG are dirty; every other region is kept as it was.
+#
+# Every connected dirty area is re-solved on its own Queen subgraph (the only
+# edges whose weights can have changed) by the engine that made the stored
+# run, with its floor, metric, ceiling and input matrix (standardized for the
+# region_engines.SCALED engines). An area gets as many regions as previous
+# regions it touches, rebalanced over the areas so k is preserved. An area
+# below the floor, or one the engine cannot split under it, joins the kept
+# region it shares most Queen edges with. Results are appended to the store
+# as new runs of the same engine, and the report gives the share of BGs whose
+# region was kept and the adjusted Rand index against the previous partition.
+# -----------------------------------------------------------------------------
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Re-solve only the SKATER regions touched by changed block groups"
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=None,
+                        help="stored k to update (default: every stored k)")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="relative indicator change that marks a BG changed")
+    return parser.parse_args()
+
+
+def changed_block_groups(new, old, attrs, tolerance):
+    """Boolean mask over ``new`` rows: new GEOID, new geometry or moved attributes."""
+    prev = old.set_index("GEOID").reindex(new["GEOID"])
+    is_new = prev["geometry"].isna().to_numpy()
+    a = new[attrs].to_numpy(dtype=float)
+    b = prev[attrs].to_numpy(dtype=float)
+    same = np.isclose(a, b, rtol=tolerance, atol=0) | (np.isnan(a) & np.isnan(b))
+    moved = ~same.all(axis=1)
+    reshaped = np.zeros(len(new), dtype=bool)
+    reshaped[~is_new] = (new.geometry.to_wkb().to_numpy()[~is_new]
+                         != prev["geometry"].to_wkb().to_numpy()[~is_new])
+    return is_new | moved | reshaped
+
+
+def share_regions(parts, prev, weight, total):
+    """Regions per dirty area: the previous regions it touches, moved to ``total``.
+
+    Regions are added where the weight per region is largest and taken away
+    where it is smallest; no area gets more regions than rows or fewer than one.
+    """
+    sizes = np.array([len(idx) for idx in parts])
+    w = np.array([weight[idx].sum() for idx in parts])
+    k = np.array([len(np.unique(prev[idx][prev[idx] >= 0])) for idx in parts])
+    k = np.clip(k, 1, sizes)
+    while k.sum() < total and (k < sizes).any():
+        k[np.argmax(np.where(k < sizes, w / k, -np.inf))] += 1
+    while k.sum() > total and (k > 1).any():
+        k[np.argmin(np.where(k > 1, w / k, np.inf))] -= 1
+    return k
+
+
+def update_partition(X, adj, prev, changed, removed_regions, solve,
+                     floor=-np.inf, weight=None):
+    """New labels keeping every region untouched by ``changed`` BGs.
+
+    ``prev`` is the previous region of each row (-1 for new BGs) and ``solve``
+    the stored run's engine as ``solve(X, adj, ks, pop=...)`` (run_engine with
+    everything else bound). ``floor`` applies to ``weight`` sums (one per row
+    by default). Returns ``(labels, dirty, n_merged)`` with ``dirty`` the mask
+    of re-solved rows and ``n_merged`` the dirty areas that joined a kept
+    region instead.
+    """
+    is_new = prev < 0
+    dirty_regions = set(prev[changed & ~is_new]) | set(removed_regions)
+    # new BGs join the regions around them
+    near_new = adj[np.flatnonzero(is_new)].indices
+    dirty_regions |= set(prev[near_new][prev[near_new] >= 0])
+    dirty = np.isin(prev, list(dirty_regions)) | is_new
+
+    labels = prev.copy()
+    if not dirty.any():
+        return labels, dirty, 0
+    weight = np.ones(len(prev)) if weight is None else np.nan_to_num(weight)
+    rows = np.flatnonzero(dirty)
+    n_parts, part = cg.connected_components(subgraph(adj, dirty), directed=False)
+    parts = [rows[part == c] for c in range(n_parts)]
+    k_parts = share_regions(parts, prev, weight, max(len(dirty_regions), n_parts))
+
+    next_label = prev.max() + 1
+    n_merged = 0
+    for idx, k in zip(parts, k_parts):
+        local = None
+        if k == 1:
+            local = np.zeros(len(idx), dtype=np.int64)
+        elif weight[idx].sum() >= floor:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    solved, _ = solve(X[idx], subgraph(adj, idx), [k], pop=weight[idx])
+                local = np.unique(solved[k], return_inverse=True)[1]
+            except ValueError:
+                # a piece of the tree is lighter than the floor
+                pass
+        if local is None or weight[idx].sum() < floor:
+            kept = adj[idx].indices
+            kept = kept[~dirty[kept]]
+            if len(kept):
+                labels[idx] = np.bincount(labels[kept]).argmax()
+                n_merged += 1
+                continue
+            local = np.zeros(len(idx), dtype=np.int64)
+        labels[idx] = next_label + local
+        next_label += local.max() + 1
+    return np.unique(labels, return_inverse=True)[1], dirty, n_merged
+
+
+def run(gdf=None, ks=None, tolerance=0.01):
+    """Stage entry point: returns the incremental update report."""
+    print("="*80)
+    print("Incremental SKATER update against the results store (Cook only)")
+    print("="*80)
+
+    # 1. Previous block groups and partitions
+    old = read_blocks()
+    runs = list_runs()
+    if ks is not None:
+        runs = runs[runs["k"].isin(ks)]
+    # the latest run of every distinct solve; older runs may lack some keys
+    key = ["k", "floor", "engine", "metric", "pop_ceiling"]
+    runs = runs.reindex(columns=runs.columns.union(key, sort=False))
+    latest = runs.groupby(key, sort=True, dropna=False).tail(1)
+    if latest.empty:
+        raise SystemExit(f"No stored runs to update in {RESULTS_DIR}")
+    prev_labels = read_labels(latest["run"])
+
+    # 2. New SES table, filtered like 03_skater_range.py
+    if gdf is None:
+        gdf = read_geometry(SES_SHP)
+    if "COUNTYFP" in gdf.columns:
+        gdf = gdf[gdf["COUNTYFP"] == "031"].copy()
+    else:
+        gdf = gdf[gdf["GEOID"].str.startswith("17031")].copy()
+    gdf = gdf.rename(columns=SHORT_NAMES)
+    attrs = [c for c in SES_INDICATORS if c in gdf.columns]
+    gdf, adj, _ = filter_rows(gdf, queen_adjacency(gdf), attrs)
+
+    # 3. Diff against the stored block groups
+    start = time.perf_counter()
+    changed = changed_block_groups(gdf, old, attrs, tolerance)
+    removed = ~old["GEOID"].isin(gdf["GEOID"]).to_numpy()
+    print(f"Block groups: {len(gdf)} ({changed.sum()} changed, "
+          f"{(~gdf['GEOID'].isin(old['GEOID'])).sum()} new, {removed.sum()} removed)")
+
+    X = gdf[attrs].to_numpy(dtype=float)
+    X_scaled = StandardScaler().fit_transform(X)
+    pop = gdf["total_pop"].to_numpy(dtype=float) if "total_pop" in gdf.columns else None
+    row = pd.Series(np.arange(len(old)), index=old["GEOID"]).reindex(gdf["GEOID"])
+    has_prev = row.notna().to_numpy()
+    row = row.fillna(0).astype(int).to_numpy()
+
+    # 4. Update every stored (k, floor)
+    report, new_labels, new_runs = [], [], []
+    for _, meta in latest.iterrows():
+        params = run_params(meta)
+        k, floor, engine = int(params["k"]), params["floor"], params["engine"]
+        if floor is not None:              # floats once a ward run's None is stored
+            floor = int(floor)
+        scaled = params.get("scaled")
+        if scaled is None:                 # runs stored before it was recorded
+            scaled = engine in SCALED
+        stored = prev_labels[meta["run"]].to_numpy().astype(np.int64)
+        prev = np.where(has_prev, stored[row], -1)
+        t0 = time.perf_counter()
+        # population floors for partitions from the constrained engine
+        weight = pop if engine == "constrained" else None
+        solve = partial(run_engine, engine, floor=floor, metric=params.get("metric"),
+                        ceiling=params.get("pop_ceiling"), islands="ignore")
+        labels, dirty, n_merged = update_partition(
+            X_scaled if scaled else X, adj, prev, changed, stored[removed], solve,
+            -np.inf if engine in NO_FLOOR or floor is None else floor, weight)
+        seconds = time.perf_counter() - t0
+        scores = score_partitions(X_scaled, labels)[0].iloc[0]
+        kept = 1 - dirty.mean()
+        report.append({
+            "k": k, "floor": floor, "engine": engine, "previous_run": meta["run"],
+            "n_changed_bgs": int(changed.sum()), "n_resolved_bgs": int(dirty.sum()),
+            "n_regions": int(labels.max() + 1),
+            "n_regions_kept": len(np.setdiff1d(labels[~dirty], labels[dirty])),
+            "n_areas_merged": n_merged,
+            "share_bgs_kept": kept,
+            "adjusted_rand": adjusted_rand_score(prev[has_prev], labels[has_prev]),
+            "BSS_TSS": scores["BSS_TSS"], "seconds": seconds,
+        })
+        new_labels.append(labels)
+        new_runs.append({"k": k, "floor": floor, "engine": engine,
+                         "k_search": "incremental", "previous_run": meta["run"],
+                         "pop_ceiling": params.get("pop_ceiling"),
+                         "metric": params.get("metric"), "scaled": scaled,
+                         "BSS_TSS": scores["BSS_TSS"]})
+        print(f"  k = {k}, floor = {floor} ({engine}): re-solved {dirty.sum()} BGs, "
+              f"kept {kept:.1%}" + (f", {n_merged} area(s) under the floor merged"
+                                    if n_merged else "") + f" ({seconds:.2f}s)")
+
+    # 5. Store the new vintage and its partitions
+    blocks = gdf[["GEOID"] + [c for c in old.columns if c in gdf.columns
+                              and c not in ("GEOID", "geometry")] + ["geometry"]]
+    # changed GEOIDs move the old vintage aside; previous_run then lives there
+    archive = write_blocks(blocks)
+    if archive is not None:
+        for meta in new_runs:
+            meta["previous_vintage"] = os.path.relpath(archive, RESULTS_DIR)
+    append_runs(np.column_stack(new_labels), new_runs)
+    report_df = pd.DataFrame(report)
+    out_path = os.path.join(OUT_DIR, "incremental_report.csv")
+    report_df.to_csv(out_path, index=False)
+    print(f"\nUpdated {len(report_df)} partition(s) in "
+          f"{time.perf_counter() - start:.1f}s")
+    print(f"Saved report to: {out_path}")
+    print("\nDone.")
+    return report_df
+
+
+def main():
+    args = parse_args()
+    run(ks=args.k, tolerance=args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
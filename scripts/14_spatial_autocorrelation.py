@@ -0,0 +1,205 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from results_store import read_partition, find_run
+from weights_cache import queen_adjacency
+from acs_ingest import SES_INDICATORS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+
+# -----------------------------------------------------------------------------
+# Global and local Moran's I
+#
+# Row-standardized Queen weights from the cached adjacency. Every SES
+# indicator is tested as is and as its within-region residual (value minus
+# its region mean at k): if the regions capture the spatial structure, the
+# residuals should show little autocorrelation left.
+#
+# Inference is by permutation, as in esda. Global I permutes all values;
+# local I_i uses conditional permutations: i keeps its value and its k_i
+# neighbours are drawn from the other n - 1. One draw of (permutations,
+# max k_i) ids is shared by all i (ids >= i shift up by one), so all rows
+# with the same number of neighbours are scored in one array operation.
+# Row and permutation batches run across the pool; pseudo p-values are
+# folded, (min(larger, P - larger) + 1) / (P + 1).
+# -----------------------------------------------------------------------------
+ROW_BATCH = 256
+PERM_BATCH = 1000
+QUADRANTS = {1: "HH", 2: "LH", 3: "LL", 4: "HL"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Global and local Moran's I of the SES indicators"
+    )
+    parser.add_argument("--k", type=int, default=None,
+                        help="stored partition the residuals are taken from "
+                             "(default: the largest k of the latest sweep)")
+    parser.add_argument("--floor", type=int, default=None)
+    parser.add_argument("--permutations", type=int, default=9999)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=2020)
+    return parser.parse_args()
+
+
+# Worker state, set once per process by the pool initializer
+_Z = None
+_W = None
+_rids = None
+
+
+def _init_worker(Z, W, rids):
+    global _Z, _W, _rids
+    _Z, _W, _rids = Z, W, rids
+
+
+def _folded_p(larger, permutations):
+    larger = np.minimum(larger, permutations - larger)
+    return (larger + 1) / (permutations + 1)
+
+
+def _local_task(j, start, stop):
+    """Conditional permutation p-values of local I for rows [start, stop)."""
+    z = _Z[:, j]
+    n = len(z)
+    scale = (n - 1) / (z @ z)
+    rows = np.arange(start, stop)
+    observed = scale * z[rows] * (_W[rows] @ z)
+    card = np.diff(_W.indptr)[rows]
+    larger = np.zeros(len(rows), dtype=np.int64)
+    for c in np.unique(card[card > 0]):
+        ids = _rids[:, :c]
+        for chunk in np.array_split(np.flatnonzero(card == c), -(-np.sum(card == c) // 32)):
+            i = rows[chunk]
+            idx = ids[None] + (ids[None] >= i[:, None, None])
+            perm = scale * z[i, None] * z[idx].mean(axis=2)
+            larger[chunk] = (perm >= observed[chunk, None]).sum(axis=1)
+    p = _folded_p(larger, len(_rids))
+    # islands have no lag to permute; like esda, they get no p-value
+    p[card == 0] = np.nan
+    return j, start, stop, p
+
+
+def _global_task(j, seed, size):
+    """Global I of ``size`` full permutations of column ``j``."""
+    z = _Z[:, j]
+    rng = np.random.default_rng(seed)
+    Zp = np.column_stack([rng.permutation(z) for _ in range(size)])
+    return j, (Zp * (_W @ Zp)).sum(axis=0) / (z @ z)
+
+
+def run(k=None, floor=None, permutations=9999, workers=1, seed=2020):
+    """Stage entry point: returns the per-BG LISA table and the global results."""
+    print("="*80)
+    print("Global and local Moran's I of the SES indicators (Cook only)")
+    print("="*80)
+
+    # 1. Stored block groups, the k-region partition and row-standardized W
+    k = int(find_run(k, floor)["k"])
+    col = f"skater_{k}"
+    gdf = read_partition(k, floor)
+    adj = queen_adjacency(gdf)
+    deg = np.asarray(adj.sum(axis=1)).ravel()
+    W = sparse.diags(1 / np.maximum(deg, 1)) @ sparse.csr_matrix(adj, dtype=float)
+    W = W.tocsr()
+
+    indicators = [c for c in SES_INDICATORS if c in gdf.columns]
+    X = gdf[indicators].to_numpy(dtype=float)
+    resid = X - gdf.groupby(col)[indicators].transform("mean").to_numpy()
+    names = indicators + [f"{c}_resid" for c in indicators]
+    Z = np.column_stack([X - X.mean(axis=0), resid - resid.mean(axis=0)])
+    n, v = Z.shape
+    print(f"Block groups: {n}, variables: {v} ({len(indicators)} indicators "
+          f"and their residuals at k = {k})")
+
+    # 2. Observed statistics
+    lag = W @ Z
+    ss = (Z * Z).sum(axis=0)
+    I_global = (Z * lag).sum(axis=0) / ss
+    I_local = (n - 1) * Z * lag / ss
+
+    # 3. Permutation batches
+    rng = np.random.default_rng(seed)
+    rids = np.array([rng.choice(n - 1, size=int(deg.max()), replace=False)
+                     for _ in range(permutations)])
+    seeds = np.random.SeedSequence(seed).spawn(v * -(-permutations // PERM_BATCH))
+    local_jobs = [(_local_task, (j, s, min(s + ROW_BATCH, n)))
+                  for j in range(v) for s in range(0, n, ROW_BATCH)]
+    global_jobs = []
+    for j in range(v):
+        for s in range(0, permutations, PERM_BATCH):
+            global_jobs.append((_global_task, (j, seeds[len(global_jobs)],
+                                               min(PERM_BATCH, permutations - s))))
+    jobs = global_jobs + local_jobs
+    print(f"\nRunning {permutations} permutations as {len(jobs)} batch(es) "
+          f"with {workers} worker(s)")
+
+    p_local = np.empty((n, v))
+    perms_global = [[] for _ in range(v)]
+
+    def collect(result):
+        if len(result) == 2:
+            j, values = result
+            perms_global[j].append(values)
+        else:
+            j, start, stop, p = result
+            p_local[start:stop, j] = p
+
+    init_args = (Z, W, rids)
+    if workers <= 1:
+        _init_worker(*init_args)
+        for fn, args in jobs:
+            collect(fn(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(fn, *args) for fn, args in jobs]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    # 4. Global table
+    rows = []
+    for j, name in enumerate(names):
+        sim = np.concatenate(perms_global[j])
+        rows.append({
+            "variable": name, "k": k if name.endswith("_resid") else None,
+            "I": I_global[j], "EI": -1 / (n - 1),
+            "EI_sim": sim.mean(), "z_sim": (I_global[j] - sim.mean()) / sim.std(),
+            "p_sim": _folded_p((sim >= I_global[j]).sum(), len(sim)),
+        })
+        print(f"  {name:<28} I = {I_global[j]:7.3f}  p_sim = {rows[-1]['p_sim']:.4f}")
+    global_df = pd.DataFrame(rows)
+
+    # 5. Per-BG table: local I, pseudo p-value and quadrant per variable
+    quadrant = np.where(Z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+    quadrant[deg == 0] = 0                 # islands: no quadrant (NaN)
+    local = {"GEOID": gdf["GEOID"].to_numpy(), col: gdf[col].to_numpy()}
+    for j, name in enumerate(names):
+        local[f"{name}_I"] = I_local[:, j]
+        local[f"{name}_p"] = p_local[:, j]
+        local[f"{name}_q"] = pd.Categorical.from_codes(
+            quadrant[:, j] - 1, list(QUADRANTS.values()))
+    local_df = pd.DataFrame(local)
+
+    global_out = os.path.join(OUT_DIR, "moran_global.csv")
+    local_out = os.path.join(OUT_DIR, "lisa_block_groups.csv")
+    global_df.to_csv(global_out, index=False)
+    local_df.to_csv(local_out, index=False)
+    print(f"\nSaved global Moran's I to: {global_out}")
+    print(f"Saved per-BG LISA table to: {local_out}")
+    print("\nDone.")
+    return local_df, global_df
+
+
+def main():
+    args = parse_args()
+    run(k=args.k, floor=args.floor, permutations=args.permutations,
+        workers=args.workers, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import os
+import glob
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# -----------------------------------------------------------------------------
+# Columnar ACS ingestion
+#
+# Only GEO_ID and the requested B*_00xE columns are parsed, directly as
+# float64, and rows outside the GEOID prefixes are dropped batch by batch
+# before anything becomes a pandas object. Parsed tables are cached to Parquet
+# keyed on the CSV's size/mtime, the columns and the prefixes.
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CACHE_DIR = os.path.join(BASE_DIR, "output", "cache", "acs")
+
+GEO_PREFIX = "1500000US"
+
+# ACS annotation / jam values; the old str.replace + to_numeric(errors="coerce")
+# path turned all of these into NaN, so they are parsed as nulls.
+ACS_NULLS = ["", "-", "N", "(X)", "null", "**", "***", "*****",
+             "250,000+", "2,500-"]
+
+
+def _cache_path(path, columns, prefixes, cache_dir):
+    st = os.stat(path)
+    h = hashlib.sha1(
+        f"{st.st_size}:{st.st_mtime_ns}:{','.join(columns)}:"
+        f"{','.join(prefixes)}".encode()
+    )
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}_{h.hexdigest()[:12]}.parquet")
+
+
+def _prefix_mask(geo_id, prefixes):
+    mask = None
+    for prefix in prefixes:
+        hit = pc.starts_with(geo_id, GEO_PREFIX + prefix)
+        mask = hit if mask is None else pc.or_(mask, hit)
+    return mask
+
+
+def read_acs_table(filename, columns, prefixes=("17031",),
+                   data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """Read ``columns`` of an ACS CSV for GEOIDs starting with ``prefixes``.
+
+    Returns a DataFrame with a string ``GEOID`` column (``1500000US``
+    stripped) followed by ``columns`` as float64.
+    """
+    columns = list(columns)
+    prefixes = tuple(prefixes)
+    path = os.path.join(data_dir, filename)
+    cached = _cache_path(path, columns, prefixes, cache_dir)
+    if os.path.exists(cached):
+        df = pd.read_parquet(cached)
+        print(f"Reading {filename}... ✓ ({len(df)} rows, cached)")
+        return df
+
+    reader = pv.open_csv(
+        path,
+        # row 2 of the data.census.gov export repeats the labels as text
+        read_options=pv.ReadOptions(skip_rows_after_names=1),
+        convert_options=pv.ConvertOptions(
+            include_columns=["GEO_ID"] + columns,
+            column_types={"GEO_ID": pa.string(),
+                          **{c: pa.float64() for c in columns}},
+            null_values=ACS_NULLS,
+            strings_can_be_null=False,
+        ),
+    )
+    batches = []
+    for batch in reader:
+        batches.append(batch.filter(_prefix_mask(batch.column("GEO_ID"), prefixes)))
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+
+    geoid = pc.utf8_slice_codeunits(table.column("GEO_ID"), len(GEO_PREFIX))
+    table = table.drop_columns(["GEO_ID"]).add_column(0, "GEOID", geoid)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # pool workers may parse the same table at once; never expose a partial file
+    tmp = f"{cached[:-8]}.{os.getpid()}.parquet"
+    pq.write_table(table, tmp)
+    os.replace(tmp, cached)
+    df = table.to_pandas()
+    print(f"Reading {filename}... ✓ ({len(df)} rows)")
+    return df
+
+
+# -----------------------------------------------------------------------------
+# Declarative indicator spec
+#
+# ACS_TABLES: table -> {count name: [codes summed into it]}
+# ACS_RATES:  rate name -> (numerator count, denominator count), as a percent
+# Adding an indicator means adding entries here; build_indicators reads each
+# table once, indexes it on GEOID and joins everything in one concat.
+# -----------------------------------------------------------------------------
+ACS_FILE_TEMPLATE = "ACSDT5Y2020.{table}-Data.csv"
+
+ACS_TABLES = {
+    "B03002": {                                   # race/ethnicity
+        "total_pop": ["B03002_001E"],
+        "white_nh": ["B03002_003E"],
+        "black_nh": ["B03002_004E"],
+        "asian_nh": ["B03002_006E"],
+        "hispanic": ["B03002_012E"],
+    },
+    "B19013": {                                   # income
+        "median_hh_income": ["B19013_001E"],
+    },
+    "B17021": {                                   # poverty
+        "poverty_universe": ["B17021_001E"],
+        "poverty_below": ["B17021_002E"],
+    },
+    "B15003": {                                   # education
+        "edu_total_25plus": ["B15003_001E"],
+        # BA+ is bachelor, master, professional, doctorate
+        "ba_plus": ["B15003_022E", "B15003_023E", "B15003_024E", "B15003_025E"],
+    },
+    "B23025": {                                   # labor
+        "labor_force": ["B23025_001E"],
+        "unemployed": ["B23025_005E"],
+    },
+    "B25003": {                                   # tenure
+        "tenure_total_occ": ["B25003_001E"],
+        "owner_occ": ["B25003_002E"],
+        "renter_occ": ["B25003_003E"],
+    },
+    "B01001": {                                   # age (optional)
+        "age_total": ["B01001_001E"],
+    },
+}
+
+ACS_RATES = {
+    "pct_white_nh": ("white_nh", "total_pop"),
+    "pct_black_nh": ("black_nh", "total_pop"),
+    "pct_asian_nh": ("asian_nh", "total_pop"),
+    "pct_hispanic": ("hispanic", "total_pop"),
+    "poverty_rate": ("poverty_below", "poverty_universe"),
+    "pct_ba_plus": ("ba_plus", "edu_total_25plus"),
+    "unemployment_rate": ("unemployed", "labor_force"),
+    "pct_owner": ("owner_occ", "tenure_total_occ"),
+    "pct_renter": ("renter_occ", "tenure_total_occ"),
+}
+
+# The indicators the regionalization clusters on. Shapefiles truncate field
+# names to 10 characters; SHORT_NAMES maps those back to the full names.
+SES_INDICATORS = [
+    "pct_white_nh", "pct_black_nh", "pct_asian_nh", "pct_hispanic",
+    "median_hh_income", "poverty_rate", "pct_ba_plus", "unemployment_rate",
+    "pct_owner", "pct_renter",
+]
+SHORT_NAMES = {name[:10]: name for name in SES_INDICATORS + ["total_pop"]}
+
+
+def table_counts(raw, counts):
+    """Collapse raw ACS code columns into the named counts of one table.
+
+    Multi-code counts treat missing codes as 0, single codes stay as read.
+    """
+    out = {}
+    for name, codes in counts.items():
+        out[name] = raw[codes].sum(axis=1) if len(codes) > 1 else raw[codes[0]]
+    return pd.DataFrame(out, index=raw.index)
+
+
+def compute_rates(counts, rates=ACS_RATES):
+    """All ``rates`` as one matrix division; a zero denominator gives NaN."""
+    num = counts[[n for n, _ in rates.values()]].to_numpy(dtype=float)
+    den = counts[[d for _, d in rates.values()]].to_numpy(dtype=float)
+    den[den == 0] = np.nan
+    return pd.DataFrame(num / den * 100, index=counts.index, columns=list(rates))
+
+
+def build_indicators(tables=ACS_TABLES, rates=ACS_RATES, prefixes=("17031",),
+                     file_template=ACS_FILE_TEMPLATE, data_dir=DATA_DIR,
+                     cache_dir=CACHE_DIR):
+    """Counts plus rates for every GEOID of the first table, indexed on GEOID."""
+    frames = []
+    for table, counts in tables.items():
+        codes = list(dict.fromkeys(c for cs in counts.values() for c in cs))
+        raw = read_acs_table(file_template.format(table=table), codes,
+                             prefixes, data_dir=data_dir,
+                             cache_dir=cache_dir).set_index("GEOID")
+        frames.append(table_counts(raw, counts))
+
+    # Rows follow the first table, as the old chain of left merges did
+    counts = pd.concat(frames, axis=1).reindex(frames[0].index)
+    return pd.concat([counts, compute_rates(counts, rates)], axis=1)
+
+
+# -----------------------------------------------------------------------------
+# Margins of error
+#
+# Every B*_00xE estimate has a B*_00xM column holding its 90% MOE. Summed
+# counts combine their MOEs in quadrature and rates use the Census
+# proportion formula, falling back to the ratio formula when the proportion
+# radicand is negative (ACS General Handbook, ch. 8).
+# -----------------------------------------------------------------------------
+def moe_code(code):
+    """``B17021_002E`` -> ``B17021_002M``."""
+    return code[:-1] + "M"
+
+
+def indicator_moes(indicators, tables=ACS_TABLES, rates=ACS_RATES,
+                   prefixes=("17031",), file_template=ACS_FILE_TEMPLATE,
+                   data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """90% MOEs for the counts and rates of ``indicators`` (same shape).
+
+    ``indicators`` is the frame returned by build_indicators for the same
+    tables and prefixes. Annotated MOEs (e.g. ``*****`` for controlled
+    estimates) come back as NaN.
+    """
+    frames = []
+    for table, counts in tables.items():
+        codes = list(dict.fromkeys(moe_code(c) for cs in counts.values() for c in cs))
+        raw = read_acs_table(file_template.format(table=table), codes, prefixes,
+                             data_dir=data_dir, cache_dir=cache_dir).set_index("GEOID")
+        out = {}
+        for name, cs in counts.items():
+            ms = [moe_code(c) for c in cs]
+            out[name] = np.sqrt((raw[ms] ** 2).sum(axis=1)) if len(ms) > 1 else raw[ms[0]]
+        frames.append(pd.DataFrame(out, index=raw.index))
+    moes = pd.concat(frames, axis=1).reindex(indicators.index)
+
+    num = indicators[[n for n, _ in rates.values()]].to_numpy(dtype=float)
+    den = indicators[[d for _, d in rates.values()]].to_numpy(dtype=float)
+    num_moe = moes[[n for n, _ in rates.values()]].to_numpy(dtype=float)
+    den_moe = moes[[d for _, d in rates.values()]].to_numpy(dtype=float)
+    den[den == 0] = np.nan
+    p = num / den
+    radicand = num_moe ** 2 - p ** 2 * den_moe ** 2
+    radicand = np.where(radicand < 0, num_moe ** 2 + p ** 2 * den_moe ** 2, radicand)
+    rate_moes = pd.DataFrame(np.sqrt(radicand) / den * 100, index=moes.index,
+                             columns=list(rates))
+    return pd.concat([moes, rate_moes], axis=1)
+
+
+# -----------------------------------------------------------------------------
+# Streaming ingestion
+#
+# For national runs each CSV is read in blocks of `block_size` bytes. Every
+# block is filtered on the GEOID prefixes and collapsed into its table's counts
+# before the next one is read, and the counts are streamed into a per-table
+# Parquet dataset partitioned by state and county. A second pass joins the
+# tables one county at a time, computes the rates and writes the indicators
+# as <out_dir>/state=SS/county=CCC/part-0.parquet. Peak memory is one block
+# plus one county, whatever the number of rows.
+# -----------------------------------------------------------------------------
+PARTITIONING = ds.partitioning(pa.schema([("state", pa.string()),
+                                          ("county", pa.string())]), flavor="hive")
+
+
+def _count_batches(path, counts, prefixes, block_size):
+    codes = list(dict.fromkeys(c for cs in counts.values() for c in cs))
+    reader = pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(skip_rows_after_names=1, block_size=block_size),
+        convert_options=pv.ConvertOptions(
+            include_columns=["GEO_ID"] + codes,
+            column_types={"GEO_ID": pa.string(), **{c: pa.float64() for c in codes}},
+            null_values=ACS_NULLS,
+            strings_can_be_null=False,
+        ),
+    )
+    for batch in reader:
+        batch = batch.filter(_prefix_mask(batch.column("GEO_ID"), prefixes))
+        if not batch.num_rows:
+            continue
+        geoid = pc.utf8_slice_codeunits(batch.column("GEO_ID"), len(GEO_PREFIX))
+        values = table_counts(batch.select(codes).to_pandas(), counts)
+        yield pa.RecordBatch.from_arrays(
+            [geoid]
+            + [pa.array(values[name].to_numpy(dtype=float)) for name in counts]
+            + [pc.utf8_slice_codeunits(geoid, 0, 2), pc.utf8_slice_codeunits(geoid, 2, 5)],
+            names=["GEOID"] + list(counts) + ["state", "county"],
+        )
+
+
+def stream_indicators(out_dir, tables=ACS_TABLES, rates=ACS_RATES, prefixes=("",),
+                      file_template=ACS_FILE_TEMPLATE, data_dir=DATA_DIR,
+                      cache_dir=CACHE_DIR, block_size=16 << 20):
+    """Counts plus rates for every GEOID matching ``prefixes``, by county.
+
+    The default prefix keeps every block group in the files. Returns one row
+    per written (state, county) partition with its number of rows.
+    """
+    prefixes = tuple(prefixes)
+    spill = os.path.join(cache_dir, "stream")
+    for table, counts in tables.items():
+        schema = pa.schema([("GEOID", pa.string())]
+                           + [(name, pa.float64()) for name in counts]
+                           + [("state", pa.string()), ("county", pa.string())])
+        filename = file_template.format(table=table)
+        ds.write_dataset(
+            _count_batches(os.path.join(data_dir, filename), counts, prefixes, block_size),
+            os.path.join(spill, table), schema=schema, format="parquet",
+            partitioning=PARTITIONING, existing_data_behavior="delete_matching",
+            preserve_order=True,
+            basename_template="part-{i}.parquet",
+        )
+        print(f"Streaming {filename}... ✓")
+
+    # Rows follow the first table, as in build_indicators
+    first = next(iter(tables))
+    written = []
+    for part in sorted(glob.glob(os.path.join(spill, first, "state=*", "county=*"))):
+        rel = os.path.relpath(part, os.path.join(spill, first))
+        frames = []
+        for table, counts in tables.items():
+            path = os.path.join(spill, table, rel)
+            if os.path.isdir(path):
+                frames.append(pd.read_parquet(path, columns=["GEOID"] + list(counts))
+                              .set_index("GEOID"))
+            else:
+                frames.append(pd.DataFrame(columns=list(counts), dtype=float))
+        county = pd.concat(frames, axis=1).reindex(frames[0].index)
+        county = pd.concat([county, compute_rates(county, rates)], axis=1)
+        os.makedirs(os.path.join(out_dir, rel), exist_ok=True)
+        county.reset_index().to_parquet(os.path.join(out_dir, rel, "part-0.parquet"),
+                                        index=False)
+        state, code = (p.split("=")[1] for p in rel.split(os.sep))
+        written.append({"state": state, "county": code, "n_rows": len(county)})
+    shutil.rmtree(spill)
+    return pd.DataFrame(written)
+
+
+def read_indicators(out_dir, prefix):
+    """Indicators written by stream_indicators for one state or county prefix."""
+    path = os.path.join(out_dir, f"state={prefix[:2]}")
+    if len(prefix) >= 5:
+        path = os.path.join(path, f"county={prefix[2:5]}")
+    df = pd.read_parquet(path)
+    df = df[df["GEOID"].str.startswith(prefix)]
+    return df.drop(columns=["state", "county"], errors="ignore").set_index("GEOID")
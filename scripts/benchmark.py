@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from sklearn.preprocessing import StandardScaler
+from acs_ingest import build_indicators
+from geo_io import read_geometry
+from weights_cache import queen_adjacency, filter_rows, to_w
+from skater_hierarchy import skater_hierarchy
+from memo_skater import memo_skater
+from constrained_skater import constrained_skater
+from region_engines import ward_regions, redcap_regions, maxp_regions, FREE_K
+from partition_metrics import score_partitions
+from region_geometry import block_group_geometry, region_shape_stats
+from map_render import render_maps
+
+# -----------------------------------------------------------------------------
+# Benchmark harness
+#
+# Times and memory-profiles (tracemalloc peak, from a separate traced run so the
+# timings are not slowed by tracing) each pipeline stage on Cook and
+# on synthetic Queen lattices: ACS ingest, shapefile read, weights, SKATER
+# (cumulative seconds at every k), BSS/TSS, region dissolve statistics and map
+# rendering. Every stage starts from empty caches. Each regionalization engine
+# (see region_engines) also gets its BSS/TSS at every k, and the per-engine,
+# per-k numbers are written as a table (engines_<time>.csv) for head-to-head
+# comparison. Results are written to
+# output/benchmarks/bench_<time>.json together with the log-log scaling slope
+# of each stage over the lattice sizes, and compared with a stored baseline:
+# a stage is flagged when it is both `tolerance` slower (or larger) and
+# `min_seconds` slower than the baseline, and the run then exits with status 1.
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join(BASE_DIR, "output")
+BENCH_DIR = os.path.join(OUT_DIR, "benchmarks")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+SES_SHP = os.path.join(OUT_DIR, "cook_bg_acs2020_ses.shp")
+TIGER_SHP = os.path.join(BASE_DIR, "shapefiles", "tl_2020_17_bg.shp")
+
+SES_ATTRS = ["pct_white_", "pct_black_", "pct_asian_", "pct_hispan", "median_hh_",
+             "poverty_ra", "pct_ba_plu", "unemployme", "pct_owner", "pct_renter"]
+SPOPT_ENGINES = {"hierarchical", "maxp"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile the regionalization stages"
+    )
+    parser.add_argument("--cases", nargs="+", choices=["cook", "lattice"],
+                        default=["cook", "lattice"])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1_000, 10_000, 100_000],
+                        help="lattice sizes (nodes, rounded to a square)")
+    parser.add_argument("--k", type=int, nargs="+", default=[60, 70, 80, 90])
+    parser.add_argument("--floor", type=int, default=10,
+                        help="region floor in block groups")
+    parser.add_argument("--pop-floor", type=float, default=20_000,
+                        help="population floor for the constrained engine")
+    parser.add_argument("--engines", nargs="+", default=["memo", "constrained"],
+                        choices=["memo", "constrained", "hierarchical", "ward",
+                                 "redcap", "maxp"])
+    parser.add_argument("--spopt-max-nodes", type=int, default=2_000,
+                        help="skip spopt-based engines above this many nodes")
+    parser.add_argument("--no-render", action="store_true")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per stage; the fastest is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.05)
+    return parser.parse_args()
+
+
+class Bench:
+    """Collects one record per (case, n, stage)."""
+
+    def __init__(self, repeat=1):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, case, n, stage, fn, **extra):
+        """Time ``fn(cache_dir)``; stages with a disk cache build it in cache_dir."""
+        # tracing every allocation slows Python-heavy code several-fold, so
+        # time untraced runs and take the peak from one extra traced run.
+        # Every run gets its own empty cache, or all but the first would
+        # measure cache hits.
+        seconds = np.inf
+        for _ in range(self.repeat):
+            with tempfile.TemporaryDirectory() as cache:
+                start = time.perf_counter()
+                value = fn(cache)
+                seconds = min(seconds, time.perf_counter() - start)
+        with tempfile.TemporaryDirectory() as cache:
+            tracemalloc.start()
+            fn(cache)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.results.append({"case": case, "n": n, "stage": stage,
+                             "seconds": seconds, "peak_mb": peak / 1e6, **extra})
+        print(f"  {case:<8} n={n:<7} {stage:<22} {seconds:9.3f}s  "
+              f"peak {peak / 1e6:8.1f} MB")
+        return value
+
+
+def lattice_frame(n, seed=0):
+    """Square-cell lattice of about ``n`` cells with smooth SES-like fields."""
+    side = int(round(np.sqrt(n)))
+    n = side * side
+    rng = np.random.default_rng(seed)
+    col, row = np.divmod(np.arange(n), side)
+    x, y = 400_000 + 500.0 * col, 2_100_000 + 500.0 * row
+    cells = shapely.box(x, y, x + 500, y + 500)
+
+    # a few broad gradients plus noise, so regions have something to find
+    u, v = col / side, row / side
+    fields = [np.sin(3 * u + f) * np.cos(2 * v - f) for f in np.linspace(0, 2, len(SES_ATTRS))]
+    attrs = {a: 50 + 20 * f + rng.normal(0, 5, n) for a, f in zip(SES_ATTRS, fields)}
+    return gpd.GeoDataFrame(
+        {"GEOID": [f"L{i:07d}" for i in range(n)],
+         "total_pop": rng.integers(300, 3_000, n), **attrs},
+        geometry=cells, crs="EPSG:5070")
+
+
+def bench_frame(bench, case, gdf, ks, args, tmp):
+    """Weights, SKATER, BSS/TSS, dissolve and render stages for ``gdf``."""
+    n = len(gdf)
+    adj = bench.measure(case, n, "weights",
+                        lambda cache: queen_adjacency(gdf, cache_dir=cache))
+
+    # Same row filtering as 03_skater_range.py
+    gdf, adj, _ = filter_rows(gdf, adj, SES_ATTRS)
+    # every engine gets the standardized matrix it is scored on, so the
+    # head-to-head numbers differ by engine only
+    X_scaled = StandardScaler().fit_transform(gdf[SES_ATTRS].to_numpy())
+    pop = gdf["total_pop"].to_numpy()
+
+    solvers = {
+        "memo": lambda: memo_skater(X_scaled, adj, ks, floor=args.floor),
+        "constrained": lambda: constrained_skater(X_scaled, adj, ks, pop=pop,
+                                                  floor=args.pop_floor),
+        "hierarchical": lambda: skater_hierarchy(X_scaled, to_w(adj), ks,
+                                                 floor=args.floor),
+        "ward": lambda: ward_regions(X_scaled, adj, ks),
+        "redcap": lambda: redcap_regions(X_scaled, adj, ks, floor=args.floor),
+        "maxp": lambda: maxp_regions(X_scaled, adj, floor=args.floor),
+    }
+    labels = None
+    for engine in args.engines:
+        if engine in SPOPT_ENGINES and n > args.spopt_max_nodes:
+            print(f"  {case:<8} n={n:<7} skater[{engine}] skipped "
+                  f"(n > --spopt-max-nodes)")
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            solved, per_k = bench.measure(case, n, f"skater[{engine}]",
+                                          lambda cache: solvers[engine]())
+        record = bench.results[-1]
+        record["per_k"] = {str(k): s for k, s in per_k.items()}
+        scores = score_partitions(X_scaled, np.column_stack(list(solved.values())))[0]
+        record["bss_tss"] = dict(zip(map(str, solved), scores["BSS_TSS"].tolist()))
+        print("  " + " " * 28 + "BSS/TSS " + ", ".join(
+            f"k={k}: {v:.3f}" for k, v in record["bss_tss"].items()))
+        if engine not in FREE_K:
+            labels = solved
+    if labels is None:
+        return
+
+    matrix = np.column_stack([labels[k] for k in ks])
+    bench.measure(case, n, "bss_tss", lambda cache: score_partitions(X_scaled, matrix))
+
+    def dissolve(cache):
+        base = block_group_geometry(gdf, adj)
+        return [region_shape_stats(base, labels[k]) for k in ks]
+    bench.measure(case, n, "dissolve", dissolve)
+
+    if not args.no_render:
+        spec = {"out": os.path.join(tmp, f"{case}_{n}.png"), "figsize": (8, 8),
+                "panels": [{"values": labels[max(ks)], "categorical": True,
+                            "cmap": "tab20", "linewidth": 0.1}]}
+        bench.measure(case, n, "render",
+                      lambda cache: render_maps(gdf, [spec], cache_dir=cache))
+
+
+def engine_table(results):
+    """One row per case, n, engine and k: seconds to reach k, peak and BSS/TSS."""
+    rows = []
+    for r in results:
+        if not r["stage"].startswith("skater["):
+            continue
+        for k, seconds in r["per_k"].items():
+            rows.append({"case": r["case"], "n": r["n"], "engine": r["stage"][7:-1],
+                         "k": int(k), "seconds": seconds, "peak_mb": r["peak_mb"],
+                         "BSS_TSS": r["bss_tss"][k]})
+    return pd.DataFrame(rows, columns=["case", "n", "engine", "k", "seconds",
+                                       "peak_mb", "BSS_TSS"])
+
+
+def scaling_slopes(results):
+    """Log-log slope of seconds against n for every lattice stage."""
+    df = pd.DataFrame(results)
+    df = df[(df["case"] == "lattice") & (df["seconds"] > 0)]
+    slopes = {}
+    for stage, grp in df.groupby("stage"):
+        if grp["n"].nunique() >= 2:
+            slopes[stage] = float(np.polyfit(np.log(grp["n"]), np.log(grp["seconds"]), 1)[0])
+    return slopes
+
+
+def plot_scaling(results, out_png):
+    df = pd.DataFrame(results)
+    df = df[df["case"] == "lattice"]
+    if df["n"].nunique() < 2:
+        return
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for stage, grp in df.groupby("stage"):
+        grp = grp.sort_values("n")
+        ax.plot(grp["n"], grp["seconds"], marker="o", label=stage)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("Lattice nodes", fontsize=12)
+    ax.set_ylabel("Seconds", fontsize=12)
+    ax.set_title("Stage scaling on Queen lattices", fontsize=14)
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend(fontsize=9)
+    fig.tight_layout()
+    fig.savefig(out_png, dpi=150)
+    plt.close(fig)
+    print(f"Saved: {out_png}")
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Print the comparison with ``baseline``; return the regressed records."""
+    base = {(r["case"], r["n"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'case':<8} {'n':>7} {'stage':<22} {'baseline':>9} {'now':>9} {'ratio':>6}")
+    for r in results:
+        b = base.get((r["case"], r["n"], r["stage"]))
+        if b is None:
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] > 0 else np.inf
+        slower = ratio > 1 + tolerance and r["seconds"] - b["seconds"] > min_seconds
+        bigger = (r["peak_mb"] > b["peak_mb"] * (1 + tolerance)
+                  and r["peak_mb"] - b["peak_mb"] > 1.0)
+        flag = "  SLOWER" if slower else ""
+        flag += "  MORE MEMORY" if bigger else ""
+        print(f"{r['case']:<8} {r['n']:>7} {r['stage']:<22} {b['seconds']:9.3f} "
+              f"{r['seconds']:9.3f} {ratio:6.2f}{flag}")
+        if slower or bigger:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    ks = sorted(args.k)
+    bench = Bench(repeat=args.repeat)
+
+    print("="*80)
+    print("Regionalization benchmarks")
+    print("="*80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if "cook" in args.cases:
+            print("\nCook County")
+            if os.path.exists(os.path.join(BASE_DIR, "data")):
+                bench.measure("cook", 0, "acs_ingest", lambda cache: build_indicators(
+                    prefixes=("17031",), cache_dir=cache))
+            if os.path.exists(TIGER_SHP):
+                bench.measure("cook", 0, "shapefile_read", lambda cache: read_geometry(
+                    TIGER_SHP, where="COUNTYFP = '031'", cache_dir=cache))
+            if os.path.exists(SES_SHP):
+                gdf = read_geometry(SES_SHP, cache_dir=os.path.join(tmp, "geo"))
+                bench_frame(bench, "cook", gdf, ks, args, tmp)
+            else:
+                print(f"  {SES_SHP} not found; run 01_extract_and_merge_acs.py first")
+
+        if "lattice" in args.cases:
+            for size in sorted(args.sizes):
+                print(f"\nLattice ~{size} nodes")
+                bench_frame(bench, "lattice", lattice_frame(size), ks, args, tmp)
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    report = {
+        "created": stamp,
+        "machine": {"python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "numpy": np.__version__},
+        "params": vars(args),
+        "results": bench.results,
+        "scaling": scaling_slopes(bench.results),
+    }
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    out_json = os.path.join(BENCH_DIR, f"bench_{stamp}.json")
+    with open(out_json, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nSaved: {out_json}")
+    engines = engine_table(bench.results)
+    if len(engines):
+        out_csv = os.path.join(BENCH_DIR, f"engines_{stamp}.csv")
+        engines.to_csv(out_csv, index=False)
+        print(f"Saved: {out_csv}")
+    plot_scaling(bench.results, os.path.join(BENCH_DIR, f"scaling_{stamp}.png"))
+
+    if report["scaling"]:
+        print("\nScaling exponents (seconds ~ n^b):")
+        for stage, slope in report["scaling"].items():
+            print(f"  {stage:<22} b = {slope:.2f}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(bench.results, json.load(fh),
+                                  args.tolerance, args.min_seconds)
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Saved baseline: {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,34 @@ import matplotlib.pyplot as plt
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
 metrics_path = os.path.join(OUT_DIR, "skater_metrics_60_90.csv")
+# written by 03_skater_range.py --k-search adaptive
+selection_path = os.path.join(OUT_DIR, "skater_k_selection.csv")
 
-df = pd.read_csv(metrics_path) 
 
-plt.figure()
-plt.plot(df["n_clusters"], df["BSS_TSS"], marker="o")
-plt.xlabel("Number of regions (k)")
-plt.ylabel("BSS/TSS")
-plt.title("SES separation vs number of regions (SKATER)")
-plt.grid(True)
-plt.savefig(os.path.join(OUT_DIR, "bss_tss_vs_k.png"), dpi=300, bbox_inches="tight")
+def run(df=None):
+    """Stage entry point: BSS/TSS vs k plot from the SKATER metrics."""
+    if df is None:
+        df = pd.read_csv(metrics_path)
+    selection = pd.read_csv(selection_path) if os.path.exists(selection_path) else None
+
+    plt.figure()
+    # one line per floor, in whatever k the metrics hold
+    for floor, grp in df.sort_values("n_clusters").groupby("floor", sort=False):
+        label = f"floor = {floor}" if df["floor"].nunique() > 1 else None
+        plt.plot(grp["n_clusters"], grp["BSS_TSS"], marker="o", label=label)
+    if selection is not None:
+        sel = selection[selection["floor"].isin(df["floor"])]
+        plt.scatter(sel["k_selected"], sel["BSS_TSS"], s=150, marker="*",
+                    color="red", zorder=3, label="selected k")
+    if plt.gca().get_legend_handles_labels()[0]:
+        plt.legend()
+    plt.xlabel("Number of regions (k)")
+    plt.ylabel("BSS/TSS")
+    plt.title("SES separation vs number of regions (SKATER)")
+    plt.grid(True)
+    plt.savefig(os.path.join(OUT_DIR, "bss_tss_vs_k.png"), dpi=300, bbox_inches="tight")
+    plt.close("all")
+
+
+if __name__ == "__main__":
+    run()
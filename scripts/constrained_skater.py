@@ -0,0 +1,51 @@
+import time
+import warnings
+import numpy as np
+from scipy.optimize import OptimizeWarning
+from memo_skater import spanning_forest, prune_forest
+
+# -----------------------------------------------------------------------------
+# Population-constrained SKATER
+#
+# The memoized SKATER pruning (see memo_skater) on the Queen graph and
+# standardized attributes, with the size constraint on population instead of
+# block-group counts: both sides of a cut need at least ``floor`` people, and
+# while any region has more than ``ceiling`` people only cuts inside such
+# regions are taken. Both checks read the subtree population sums the pruning
+# already keeps, so they cost nothing extra per candidate cut.
+# -----------------------------------------------------------------------------
+
+
+def constrained_skater(X, adj, n_clusters_list, pop=None, floor=0,
+                       ceiling=np.inf, islands="increase", metric="sqeuclidean",
+                       mst_cache=None):
+    """Population-constrained SKATER up to ``max(n_clusters_list)``.
+
+    ``X`` is the (standardized) attribute matrix and ``adj`` the Queen
+    adjacency in the same row order; ``pop`` defaults to one per row, which
+    makes ``floor`` / ``ceiling`` block-group counts. ``metric`` and
+    ``mst_cache`` are as in memo_skater. Returns ``(labels, seconds)`` dicts
+    keyed by k, like skater_hierarchy.
+    """
+    X = np.asarray(X, dtype=float)
+    start = time.perf_counter()
+    # neighbours with identical attributes stay connected
+    msf = spanning_forest(X, adj, keep_ties=True, metric=metric,
+                          cache_dir=mst_cache)
+    mst_seconds = time.perf_counter() - start
+    labels, seconds = prune_forest(X, msf, n_clusters_list, weight=pop,
+                                   floor=floor, ceiling=ceiling, islands=islands)
+
+    if np.isfinite(ceiling):
+        pop = np.ones(X.shape[0]) if pop is None else np.nan_to_num(np.asarray(pop, dtype=float))
+        over = {k: int((np.bincount(lab, weights=pop) > ceiling).sum())
+                for k, lab in labels.items()}
+        over = {k: m for k, m in over.items() if m}
+        if over:
+            warnings.warn(
+                f"Regions above the population ceiling of {ceiling:g} remain "
+                f"(k: count) {over}.",
+                OptimizeWarning,
+                stacklevel=2,
+            )
+    return labels, {k: s + mst_seconds for k, s in seconds.items()}
@@ -0,0 +1,55 @@
+import os
+import re
+import hashlib
+import geopandas as gpd
+import pyogrio
+
+# -----------------------------------------------------------------------------
+# Geometry reader
+#
+# Shapefiles are read once through pyogrio's Arrow path with the attribute
+# `where` / `bbox` filters pushed down to OGR, and the result is cached as
+# GeoParquet. Later reads of the same file and query memory-map the cache.
+# Cache files are named <source>_<source stat>_<query>.parquet; writing a new
+# one drops the entries for older versions of the same source.
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, "output", "cache", "geo")
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:10]
+
+
+def read_geometry(path, where=None, bbox=None, columns=None, cache_dir=CACHE_DIR):
+    """GeoDataFrame for ``path`` filtered by ``where`` (SQL) and ``bbox``.
+
+    ``bbox`` is ``(minx, miny, maxx, maxy)`` in the file's CRS; ``columns``
+    limits the attribute columns read (geometry is always included).
+    """
+    st = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    source = _digest(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}")
+    query = _digest(f"{where}:{bbox}:{columns}")
+    cached = os.path.join(cache_dir, f"{name}_{source}_{query}.parquet")
+
+    if os.path.exists(cached):
+        return gpd.read_parquet(cached, memory_map=True)
+
+    gdf = pyogrio.read_dataframe(path, where=where, bbox=bbox,
+                                 columns=columns, use_arrow=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    pattern = re.compile(rf"{re.escape(name)}_([0-9a-f]{{10}})_[0-9a-f]{{10}}\.parquet")
+    for entry in os.listdir(cache_dir):
+        match = pattern.fullmatch(entry)
+        if match and match.group(1) != source:
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except FileNotFoundError:
+                pass  # another worker got there first
+    # pool workers may read the same query at once; never expose a partial file
+    tmp = f"{cached[:-8]}.{os.getpid()}.parquet"
+    gdf.to_parquet(tmp, index=False)
+    os.replace(tmp, cached)
+    return gdf
@@ -0,0 +1,59 @@
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Adaptive choice of k
+#
+# BSS/TSS rises with k with diminishing returns. The search walks the coarse
+# grid upwards and stops as soon as the marginal gain per extra region drops
+# below `min_gain`. It then bisects the gaps next to the current elbow until
+# the elbow's neighbours are adjacent integers or `max_solves` is reached.
+# The elbow is the evaluated k farthest above the chord joining the first and
+# last evaluated points of the normalized curve (Kneedle). The result depends
+# only on the curve, so the pick is reproducible.
+# -----------------------------------------------------------------------------
+
+
+def elbow(ks, values):
+    """k of the point farthest above the chord from the first to the last point."""
+    ks = np.asarray(ks, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(ks) < 3:
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    span = values[-1] - values[0]
+    y = (values - values[0]) / span if span > 0 else np.zeros_like(values)
+    return int(ks[np.argmax(y - x)])
+
+
+def select_k(evaluate, grid, min_gain=5e-4, max_solves=15):
+    """Adaptive search over ``grid`` (increasing k) with ``evaluate(k) -> BSS/TSS``.
+
+    Returns ``(k, curve)`` where ``curve`` maps every evaluated k to its value.
+    """
+    curve = {}
+
+    def value(k):
+        if k not in curve:
+            curve[k] = evaluate(k)
+        return curve[k]
+
+    # 1. Coarse grid, stopping once an extra region gains less than min_gain
+    prev = None
+    for k in grid:
+        value(k)
+        if prev is not None and (curve[k] - curve[prev]) / (k - prev) < min_gain:
+            break
+        prev = k
+
+    # 2. Bisect the gaps around the elbow
+    while len(curve) < max_solves:
+        ks = sorted(curve)
+        i = ks.index(elbow(ks, [curve[k] for k in ks]))
+        gaps = [(ks[j + 1] - ks[j], (ks[j] + ks[j + 1]) // 2)
+                for j in (i - 1, i) if 0 <= j < len(ks) - 1 and ks[j + 1] - ks[j] > 1]
+        if not gaps:
+            break
+        value(max(gaps)[1])
+
+    ks = sorted(curve)
+    return elbow(ks, [curve[k] for k in ks]), curve
@@ -0,0 +1,193 @@
+import os
+import re
+import numpy as np
+import shapely
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.path import Path
+from matplotlib.collections import PathCollection
+from matplotlib import colormaps
+from matplotlib.colors import Normalize
+from concurrent.futures import ProcessPoolExecutor
+from weights_cache import weights_key
+
+# -----------------------------------------------------------------------------
+# Batched map rendering
+#
+# Block-group polygons are converted to matplotlib Paths once (vertex and code
+# arrays cached in output/cache/maps/paths_<key>.npz, keyed like the Queen
+# cache). Every map panel is a PathCollection over those same Paths; only its
+# value array, colormap and norm change between variables and k, so no figure
+# goes back through shapely or GeoDataFrame.plot. Figures are described as
+# plain dicts and rendered across a process pool, each worker loading the
+# Paths once in its initializer.
+#
+# A figure spec:
+#   {"out": png path, "figsize": (w, h), "dpi": 300, "suptitle": str | None,
+#    "suptitle_kwds": {...}, "gridspec": {...} | None,
+#    "tight_layout": bool, "panels": [panel, ...]}
+# and a panel:
+#   {"values": array in gdf row order, "categorical": bool, "cmap": str,
+#    "title": str, "title_kwds": {...}, "linewidth": float,
+#    "edgecolor": str, "legend_kwds": {...} | None (continuous only),
+#    "slot": (rows, cols) gridspec slice or None for a 1 x n row,
+#    "text": str | None (boxed note in the upper left)}
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, "output", "cache", "maps")
+
+_paths = None
+_aspect = "equal"
+
+
+def polygon_paths(gdf, cache_dir=CACHE_DIR):
+    """Return ``(vertices, codes, offsets, aspect)`` for the polygons of ``gdf``.
+
+    Row ``i`` of ``gdf`` is ``Path(vertices[offsets[i]:offsets[i+1]], codes[...])``.
+    ``aspect`` follows GeoDataFrame.plot (1/cos(mid latitude) for a
+    geographic CRS).
+    """
+    cached = os.path.join(cache_dir, f"paths_{weights_key(gdf)}.npz")
+    if os.path.exists(cached):
+        with np.load(cached) as z:
+            vertices, codes, offsets = z["vertices"], z["codes"], z["offsets"]
+    else:
+        parts, owner = shapely.get_parts(gdf.geometry.values, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        vertices, ring_idx = shapely.get_coordinates(rings, return_index=True)
+
+        n_pts = np.bincount(ring_idx, minlength=len(rings))
+        starts = np.concatenate([[0], np.cumsum(n_pts)[:-1]])
+        codes = np.full(len(vertices), Path.LINETO, dtype=np.uint8)
+        codes[starts] = Path.MOVETO
+        codes[starts + n_pts - 1] = Path.CLOSEPOLY
+
+        # rings come out grouped by part and parts by row, so a row's
+        # vertices are contiguous
+        row_pts = np.bincount(owner[ring_part[ring_idx]], minlength=len(gdf))
+        offsets = np.concatenate([[0], np.cumsum(row_pts)])
+
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cached, vertices=vertices, codes=codes, offsets=offsets)
+
+    aspect = "equal"
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        y_mid = np.mean(gdf.total_bounds[[1, 3]])
+        aspect = 1 / np.cos(np.deg2rad(y_mid))
+    return vertices, codes, offsets, aspect
+
+
+def _init_worker(vertices, codes, offsets, aspect):
+    global _paths, _aspect
+    _paths = [Path(vertices[a:b], codes[a:b])
+              for a, b in zip(offsets[:-1], offsets[1:])]
+    _aspect = aspect
+
+
+def _draw_panel(fig, ax, panel):
+    values = panel["values"]
+    collection = PathCollection(_paths, linewidths=panel.get("linewidth", 0.1),
+                                edgecolors=panel.get("edgecolor", "black"))
+    cmap = colormaps[panel.get("cmap", "viridis")]
+    if panel.get("categorical"):
+        # sorted categories coloured as GeoDataFrame.plot(categorical=True):
+        # qualitative maps cycle through their colours, others are stretched
+        _, codes = np.unique(np.asarray(values), return_inverse=True)
+        if cmap.N < 32:
+            colors = cmap(codes % cmap.N)
+        else:
+            colors = cmap(codes / max(codes.max(), 1))
+        collection.set_facecolors(colors)
+    else:
+        values = np.ma.masked_invalid(np.asarray(values, dtype=float))
+        collection.set_array(values)
+        collection.set_cmap(cmap)
+        collection.set_norm(Normalize(values.min(), values.max()))
+
+    ax.add_collection(collection, autolim=True)
+    ax.autoscale_view()
+    ax.set_aspect(_aspect)
+    ax.set_axis_off()
+    ax.set_title(panel.get("title", ""), **panel.get("title_kwds", {}))
+
+    if panel.get("text"):
+        ax.text(0.02, 0.98, panel["text"], transform=ax.transAxes, fontsize=11,
+                verticalalignment="top",
+                bbox=dict(boxstyle="round", facecolor="wheat", alpha=0.8))
+    if not panel.get("categorical") and panel.get("legend_kwds") is not None:
+        fig.colorbar(collection, ax=ax, **panel["legend_kwds"])
+
+
+def _render(spec):
+    fig = plt.figure(figsize=spec["figsize"])
+    panels = spec["panels"]
+    if spec.get("gridspec"):
+        gs = fig.add_gridspec(**spec["gridspec"])
+        axes = [fig.add_subplot(gs[p["slot"]]) for p in panels]
+    else:
+        axes = fig.subplots(1, len(panels), squeeze=False)[0]
+    for ax, panel in zip(axes, panels):
+        _draw_panel(fig, ax, panel)
+
+    if spec.get("suptitle"):
+        fig.suptitle(spec["suptitle"], **spec.get("suptitle_kwds", {}))
+    if spec.get("tight_layout"):
+        fig.tight_layout()
+    fig.savefig(spec["out"], dpi=spec.get("dpi", 300), bbox_inches="tight")
+    plt.close(fig)
+    return spec["out"]
+
+
+def render_maps(gdf, specs, workers=1, cache_dir=CACHE_DIR):
+    """Render every figure spec for the polygons of ``gdf``; return PNG paths."""
+    init_args = polygon_paths(gdf, cache_dir=cache_dir)
+    if workers <= 1 or len(specs) <= 1:
+        _init_worker(*init_args)
+        outs = []
+        for spec in specs:
+            outs.append(_render(spec))
+            print(f"Saved: {spec['out']}")
+        return outs
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(specs)),
+                             initializer=_init_worker,
+                             initargs=init_args) as pool:
+        outs = []
+        for out in pool.map(_render, specs):
+            outs.append(out)
+            print(f"Saved: {out}")
+    return outs
+
+
+def skater_columns(gdf, floor=None):
+    """SKATER label columns of ``gdf`` for one floor as ``{k: column}``, sorted by k.
+
+    03_skater_range.py names them ``skater_<k>`` when it solves one floor and
+    ``sk<k>_f<floor>`` (``f<n>k`` for n thousand) when it solves several (see
+    its label_column). A single-floor file is returned whatever ``floor`` is;
+    otherwise ``floor`` picks one and defaults to the lowest in the file.
+    """
+    by_floor = {}
+    for col in gdf.columns:
+        m = re.fullmatch(r"skater_(\d+)", col)
+        if m:
+            by_floor.setdefault(None, {})[int(m[1])] = col
+            continue
+        m = re.fullmatch(r"sk(\d+)_f(\d+)(k?)", col)
+        if m:
+            f = int(m[2]) * (1000 if m[3] else 1)
+            by_floor.setdefault(f, {})[int(m[1])] = col
+    if None in by_floor:
+        columns = by_floor[None]
+    elif not by_floor:
+        raise ValueError("no SKATER label columns; run 03_skater_range.py first")
+    else:
+        if floor is None:
+            floor = min(by_floor)
+            print(f"SKATER labels for several floors; using floor = {floor}")
+        if floor not in by_floor:
+            raise ValueError(f"no SKATER labels for floor = {floor}; "
+                             f"the file has floors {sorted(by_floor)}")
+        columns = by_floor[floor]
+    return dict(sorted(columns.items()))
@@ -0,0 +1,200 @@
+import time
+import warnings
+import numpy as np
+from scipy.optimize import OptimizeWarning
+from scipy.sparse import csgraph as cg
+from spanning_tree import minimum_spanning_forest
+
+# -----------------------------------------------------------------------------
+# SKATER with memoized subtree statistics
+#
+# spopt's find_cut deep-copies the forest and rescores the whole map for every
+# MST edge, i.e. O(n) work per candidate cut. Here each tree of the forest is
+# rooted and every node keeps the sums of its subtree: attribute sums S,
+# the scalar sum of squares Q, the count N and a weight W (population or
+# count) for the size constraint. With SSD(T) = Q_T - |S_T|^2 / N_T, cutting
+# subtree T off its tree C changes the map SSD by
+#     SSD(C) - SSD(T) - SSD(C \ T)
+# and C \ T has sums S_C - S_T etc., so scoring a candidate is O(d).
+#
+# Nodes are numbered by an Euler tour (DFS entry time tin, subtree end tout) of
+# the initial MST, so the nodes below v are the slice [tin(v), tout(v)) and u is
+# an ancestor of v iff tin(u) < tin(v) < tout(u). A cut moves v's slice (less
+# anything already cut off it) to a new tree, subtracts v's sums from its
+# ancestors and re-scores only the two trees involved. Cuts are greedy and never
+# revisited, so one pass up to max(k) yields every k.
+#
+# With dissimilarity = squared Euclidean distance the SSD is exactly the score
+# spopt's SpanningForest minimizes, and memo_skater reproduces
+# Skater(spanning_forest_kwds={"dissimilarity": squared_euclidean}) labels.
+# spopt's default Manhattan score (L1 distance to the mean) has no such
+# decomposition.
+# -----------------------------------------------------------------------------
+
+
+def squared_euclidean(X, Y=None):
+    """Pairwise squared Euclidean distances (a spopt ``dissimilarity``)."""
+    Y = X if Y is None else Y
+    d = (X ** 2).sum(axis=1)[:, None] + (Y ** 2).sum(axis=1)[None, :] - 2 * X @ Y.T
+    return np.maximum(d, 0)
+
+
+def spanning_forest(X, adj, keep_ties=False, metric="sqeuclidean", **kwds):
+    """Minimum spanning forest of ``adj`` under squared attribute distance.
+
+    Like spopt, neighbours with identical attributes (zero dissimilarity) are
+    not connected unless ``keep_ties`` is set. Other metrics and options are
+    passed to spanning_tree.minimum_spanning_forest.
+    """
+    return minimum_spanning_forest(X, adj, metric=metric, keep_ties=keep_ties, **kwds)
+
+
+def prune_forest(X, msf, n_clusters_list, weight=None, floor=-np.inf,
+                 ceiling=np.inf, islands="increase"):
+    """Greedy SSD pruning of the spanning forest ``msf`` up to max(k).
+
+    Both sides of every cut need a ``weight`` sum of at least ``floor``
+    (``weight`` defaults to one per row); while some tree weighs more than
+    ``ceiling`` only cuts inside such trees are taken. Returns ``(labels,
+    seconds)`` dicts keyed by k; labels are numbered like
+    ``connected_components`` numbers them.
+    """
+    X = np.asarray(X, dtype=float)
+    X = X - X.mean(axis=0)               # SSD is shift invariant; less cancellation
+    n = X.shape[0]
+    weight = np.ones(n) if weight is None else np.nan_to_num(np.asarray(weight, dtype=float))
+    wanted = sorted(set(n_clusters_list))
+
+    start = time.perf_counter()
+    n_subtrees, comp = cg.connected_components(msf, directed=False)
+    comp = comp.astype(np.int64)
+
+    # Same island bookkeeping as SpanningForest.fit
+    offset = 0
+    if n_subtrees > 1:
+        if islands.lower() != "ignore":
+            offset = n_subtrees
+        if (np.bincount(comp, weights=weight) < floor).any():
+            raise ValueError(
+                "Islands must be larger than the quorum. If not, drop the small "
+                "islands and solve for clusters in the remaining field."
+            )
+
+    # Root every tree and number the nodes by an Euler tour
+    tree = msf + msf.T
+    parent = np.full(n, -1, dtype=np.int64)
+    roots, tour = [], []
+    for c in range(n_subtrees):
+        root = np.flatnonzero(comp == c)[0]
+        order, pred = cg.depth_first_order(tree, root, directed=False)
+        parent[order[1:]] = pred[order[1:]]
+        roots.append(root)
+        tour.append(order)
+    tour = np.concatenate(tour)
+    tin = np.empty(n, dtype=np.int64)
+    tin[tour] = np.arange(n)
+
+    # Subtree sums, children before parents
+    S = X.copy()
+    Q = (X ** 2).sum(axis=1)
+    N = np.ones(n)
+    W = weight.copy()
+    for v in tour[::-1]:
+        p = parent[v]
+        if p >= 0:
+            S[p] += S[v]
+            Q[p] += Q[v]
+            N[p] += N[v]
+            W[p] += W[v]
+    tout = tin + N.astype(np.int64)
+
+    def ssd(s, q, m):
+        return q - (s ** 2).sum(axis=-1) / m
+
+    def best_cut(c):
+        r = roots[c]
+        nodes = np.flatnonzero(comp == c)
+        nodes = nodes[nodes != r]
+        if not len(nodes):
+            return -np.inf, -1
+        gain = (ssd(S[r], Q[r], N[r])
+                - ssd(S[nodes], Q[nodes], N[nodes])
+                - ssd(S[r] - S[nodes], Q[r] - Q[nodes], N[r] - N[nodes]))
+        gain[(W[nodes] < floor) | (W[r] - W[nodes] < floor)] = -np.inf
+        i = np.argmax(gain)
+        return gain[i], nodes[i]
+
+    def snapshot():
+        # renumber trees by their lowest node, as connected_components does
+        _, first, inverse = np.unique(comp, return_index=True, return_inverse=True)
+        rank = np.empty(len(first), dtype=np.int64)
+        rank[np.argsort(first)] = np.arange(len(first))
+        return rank[inverse]
+
+    best = [best_cut(c) for c in range(n_subtrees)]
+
+    labels, seconds = {}, {}
+    pending = list(wanted)
+    while pending:
+        while pending and n_subtrees >= pending[0] + offset:
+            k = pending.pop(0)
+            labels[k] = snapshot()
+            seconds[k] = time.perf_counter() - start
+        if not pending:
+            break
+
+        # Trees over the ceiling are split first
+        gains = np.array([g for g, _ in best])
+        over = (W[roots] > ceiling) & np.isfinite(gains)
+        if over.any():
+            gains = np.where(over, gains, -np.inf)
+        c = int(np.argmax(gains))
+        if not np.isfinite(gains[c]):
+            warnings.warn(
+                f"MSF contains no valid moves after finding {n_subtrees} "
+                f"subtrees; k = {pending} reuse that partition.",
+                OptimizeWarning,
+                stacklevel=2,
+            )
+            for k in pending:
+                labels[k] = snapshot()
+                seconds[k] = time.perf_counter() - start
+            break
+
+        # Cut v off its parent: v's slice becomes a new tree and every
+        # ancestor of v loses v's subtree sums
+        v = best[c][1]
+        members = np.flatnonzero(comp == c)
+        below = tour[tin[v]:tout[v]]
+        below = below[comp[below] == c]
+        anc = members[(tin[members] < tin[v]) & (tin[v] < tout[members])]
+        S[anc] -= S[v]
+        Q[anc] -= Q[v]
+        N[anc] -= N[v]
+        W[anc] -= W[v]
+        parent[v] = -1
+        comp[below] = n_subtrees
+        roots.append(v)
+        n_subtrees += 1
+        best[c] = best_cut(c)
+        best.append(best_cut(n_subtrees - 1))
+
+    return labels, seconds
+
+
+def memo_skater(data, adj, n_clusters_list, floor=-np.inf, islands="increase",
+                metric="sqeuclidean", mst_cache=None):
+    """SKATER (SSD score) up to ``max(n_clusters_list)`` on the Queen graph.
+
+    ``floor`` is the minimum number of rows per region, as in spopt; ``metric``
+    weighs the spanning tree edges and ``mst_cache`` is its cache directory
+    (see spanning_tree). Returns ``(labels, seconds)`` dicts keyed by k, like
+    skater_hierarchy.
+    """
+    X = np.asarray(data, dtype=float)
+    start = time.perf_counter()
+    msf = spanning_forest(X, adj, metric=metric, cache_dir=mst_cache)
+    mst_seconds = time.perf_counter() - start
+    labels, seconds = prune_forest(X, msf, n_clusters_list, floor=floor,
+                                   islands=islands)
+    return labels, {k: s + mst_seconds for k, s in seconds.items()}
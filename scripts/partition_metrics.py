@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# Partition quality metrics
+#
+# Every candidate partition is scored from grouped sums: each label vector is
+# remapped to 0..k-1, shifted by a per-partition offset, and all partitions are
+# aggregated together with np.bincount. No Python loop touches the n rows.
+# -----------------------------------------------------------------------------
+
+
+def _as_label_matrix(labels):
+    """Return (n, m) int labels plus a name for each of the m partitions."""
+    if isinstance(labels, pd.DataFrame):
+        return labels.to_numpy(), list(labels.columns)
+    if isinstance(labels, pd.Series):
+        return labels.to_numpy()[:, None], [labels.name]
+    arr = np.asarray(labels)
+    if arr.ndim == 1:
+        arr = arr[:, None]
+    return arr, list(range(arr.shape[1]))
+
+
+def score_partitions(data, labels):
+    """Score many partitions of the same rows in a single pass.
+
+    Parameters
+    ----------
+    data : (n, p) array
+        Attribute matrix the partitions are evaluated on (e.g. ``X_scaled``).
+    labels : (n,) or (n, m) array, Series or DataFrame
+        One label vector per partition. DataFrame column names become the
+        ``partition`` ids in the output.
+
+    Returns
+    -------
+    summary : DataFrame
+        One row per partition with ``n_clusters``, ``WSS``, ``BSS``, ``TSS``,
+        ``BSS_TSS``, ``calinski_harabasz`` and ``davies_bouldin``.
+    clusters : DataFrame
+        One row per (partition, cluster) with ``size`` and ``sse``.
+    """
+    X = np.asarray(data, dtype=float)
+    L, names = _as_label_matrix(labels)
+    n, p = X.shape
+    m = L.shape[1]
+
+    # Center once so the sum / sum-of-squares identity stays well conditioned
+    X = X - X.mean(axis=0)
+    tss = float((X ** 2).sum())
+    row_sq = (X ** 2).sum(axis=1)
+
+    # Dense per-partition codes, then a global group id across partitions
+    codes = np.empty((n, m), dtype=np.int64)
+    n_clusters = np.empty(m, dtype=np.int64)
+    uniques = []
+    for j in range(m):
+        u, codes[:, j] = np.unique(L[:, j], return_inverse=True)
+        uniques.append(u)
+        n_clusters[j] = len(u)
+    offsets = np.concatenate([[0], np.cumsum(n_clusters)[:-1]])
+    gid = (codes + offsets).ravel()          # row-major: row i, partition j
+    n_groups = int(n_clusters.sum())
+    rows = np.repeat(np.arange(n), m)
+
+    size = np.bincount(gid, minlength=n_groups).astype(float)
+    sums = np.empty((n_groups, p))
+    for d in range(p):
+        sums[:, d] = np.bincount(gid, weights=X[rows, d], minlength=n_groups)
+    sumsq = np.bincount(gid, weights=row_sq[rows], minlength=n_groups)
+
+    centroids = sums / size[:, None]
+    sse = np.maximum(sumsq - (sums ** 2).sum(axis=1) / size, 0.0)
+
+    part_of_group = np.repeat(np.arange(m), n_clusters)
+    wss = np.bincount(part_of_group, weights=sse, minlength=m)
+    bss = tss - wss
+
+    # Calinski-Harabasz: (BSS / (k - 1)) / (WSS / (n - k))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ch = np.where((n_clusters > 1) & (wss > 0),
+                      (bss / (n_clusters - 1)) / (wss / (n - n_clusters)),
+                      np.nan)
+
+    # Davies-Bouldin: mean Euclidean distance of members to their centroid
+    dist = np.sqrt(((X[rows] - centroids[gid]) ** 2).sum(axis=1))
+    scatter = np.bincount(gid, weights=dist, minlength=n_groups) / size
+    db = np.full(m, np.nan)
+    for j in range(m):
+        if n_clusters[j] < 2:
+            continue
+        sl = slice(offsets[j], offsets[j] + n_clusters[j])
+        c = centroids[sl]
+        sep = np.sqrt(((c[:, None, :] - c[None, :, :]) ** 2).sum(axis=2))
+        np.fill_diagonal(sep, np.inf)
+        s = scatter[sl]
+        db[j] = np.max((s[:, None] + s[None, :]) / sep, axis=1).mean()
+
+    summary = pd.DataFrame({
+        "partition": names,
+        "n_clusters": n_clusters,
+        "WSS": wss,
+        "BSS": bss,
+        "TSS": tss,
+        "BSS_TSS": bss / tss,
+        "calinski_harabasz": ch,
+        "davies_bouldin": db,
+    })
+    clusters = pd.DataFrame({
+        "partition": np.repeat(names, n_clusters),
+        "cluster": np.concatenate(uniques),
+        "size": size.astype(int),
+        "sse": sse,
+    })
+    return summary, clusters
+
+
+def compute_bss_tss(data, labels):
+    """Single-partition ``(BSS, TSS, BSS/TSS)``; kept for existing callers."""
+    summary, _ = score_partitions(data, labels)
+    row = summary.iloc[0]
+    return float(row["BSS"]), float(row["TSS"]), float(row["BSS_TSS"])
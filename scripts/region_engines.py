@@ -0,0 +1,162 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.cluster.hierarchy import fcluster
+from sklearn.cluster import ward_tree, linkage_tree
+from spopt.region import MaxPHeuristic
+from memo_skater import memo_skater, prune_forest
+from constrained_skater import constrained_skater
+from skater_hierarchy import skater_hierarchy
+from weights_cache import to_w
+
+# -----------------------------------------------------------------------------
+# Regionalization engines behind one interface
+#
+#     engine(X, adj, n_clusters_list, floor=..., pop=None) -> (labels, seconds)
+#
+# X is the attribute matrix, adj the Queen adjacency in the same row order, and
+# both results are dicts keyed by k as in skater_hierarchy (seconds are
+# cumulative, so one-pass engines report the time at which each k was ready).
+#
+# ward     sklearn's connectivity-constrained Ward tree, i.e.
+#          AgglomerativeClustering(linkage="ward", connectivity=adj), built
+#          once and cut at every k. No size floor.
+# redcap   REDCAP (Guo 2008): a contiguity-constrained complete-linkage tree
+#          (first-order CLK: sklearn keeps distances on Queen edges only, so
+#          the cluster distance is the largest over adjacent pairs), whose
+#          merges each add the closest Queen edge between the two clusters to
+#          a spanning tree, which is then partitioned by the SSD cuts of
+#          memo_skater with the floor.
+# maxp     spopt's max-p heuristic with a floor of `floor` block groups; it
+#          picks its own number of regions, so it returns a single k. Only
+#          benchmark.py runs it: 03's (k, floor) grid and the store's replays
+#          (09, 13) need the k they ask for.
+# -----------------------------------------------------------------------------
+
+
+def _cut_tree(children, n, n_clusters_list, start):
+    """Labels 0..k-1 after the first n - k merges, for every k."""
+    sizes = np.ones(2 * n - 1)
+    for m, (a, b) in enumerate(children):
+        sizes[n + m] = sizes[a] + sizes[b]
+    # merge order as the height, so maxclust undoes the last merges first
+    Z = np.column_stack([children, np.arange(1, n), sizes[n:]]).astype(float)
+    labels, seconds = {}, {}
+    for k in sorted(set(n_clusters_list)):
+        labels[k] = fcluster(Z, t=k, criterion="maxclust") - 1
+        seconds[k] = time.perf_counter() - start
+    return labels, seconds
+
+
+def ward_regions(X, adj, n_clusters_list, floor=None, pop=None):
+    """Connectivity-constrained Ward for every k from one tree."""
+    start = time.perf_counter()
+    children, _, n_leaves, _ = ward_tree(np.asarray(X, dtype=float),
+                                         connectivity=sparse.csr_matrix(adj))
+    return _cut_tree(children, n_leaves, n_clusters_list, start)
+
+
+def redcap_tree(X, adj):
+    """Spanning tree of REDCAP's first-order complete-linkage clustering."""
+    X = np.asarray(X, dtype=float)
+    adj = sparse.csr_matrix(adj)
+    n = X.shape[0]
+    children = linkage_tree(X, connectivity=adj, linkage="complete")[0]
+
+    # owner[i] is the label of i's cluster and label[c] that of sklearn's
+    # cluster c; each merge relabels the smaller side only (O(n log n) in
+    # all) and takes the closest Queen edge from it into the larger one
+    owner = np.arange(n)
+    label = np.arange(2 * n - 1)
+    members = [[i] for i in range(n)]
+    deg = np.diff(adj.indptr)
+    rows, cols = [], []
+    for m, (a, b) in enumerate(children):
+        big, small = label[a], label[b]
+        if len(members[big]) < len(members[small]):
+            big, small = small, big
+        src = np.array(members[small])
+        starts, counts = adj.indptr[src], deg[src]
+        u = np.repeat(src, counts)
+        v = adj.indices[np.repeat(starts - np.cumsum(counts) + counts, counts)
+                        + np.arange(counts.sum())]
+        hit = owner[v] == big
+        if hit.any():
+            u, v = u[hit], v[hit]
+            i = np.argmin(((X[u] - X[v]) ** 2).sum(axis=1))
+            rows.append(u[i])
+            cols.append(v[i])
+        owner[src] = big
+        members[big].extend(members[small])
+        members[small] = None
+        label[n + m] = big
+    d = ((X[rows] - X[cols]) ** 2).sum(axis=1) + np.finfo(float).tiny
+    return sparse.csr_matrix((d, (rows, cols)), shape=(n, n))
+
+
+def redcap_regions(X, adj, n_clusters_list, floor=-np.inf, pop=None):
+    """REDCAP (first-order CLK tree, SSD partitioning) up to max(k)."""
+    X = np.asarray(X, dtype=float)
+    start = time.perf_counter()
+    tree = redcap_tree(X, adj)
+    tree_seconds = time.perf_counter() - start
+    labels, seconds = prune_forest(X, tree, n_clusters_list, floor=floor)
+    return labels, {k: s + tree_seconds for k, s in seconds.items()}
+
+
+def maxp_regions(X, adj, n_clusters_list=None, floor=10, pop=None, top_n=2,
+                 max_iterations_construction=99):
+    """spopt max-p with at least ``floor`` block groups per region."""
+    X = np.asarray(X, dtype=float)
+    attrs = [f"x{j}" for j in range(X.shape[1])]
+    df = pd.DataFrame(X, columns=attrs).assign(n_bgs=1.0)
+    start = time.perf_counter()
+    model = MaxPHeuristic(df, to_w(adj), attrs, "n_bgs", floor, top_n=top_n,
+                          max_iterations_construction=max_iterations_construction)
+    model.solve()
+    labels = np.unique(np.asarray(model.labels_), return_inverse=True)[1]
+    k = int(labels.max() + 1)
+    return {k: labels}, {k: time.perf_counter() - start}
+
+
+ENGINES = {
+    "hierarchical": lambda X, adj, ks, floor=-np.inf, pop=None:
+        skater_hierarchy(X, to_w(adj), ks, floor=floor),
+    "memo": lambda X, adj, ks, floor=-np.inf, pop=None:
+        memo_skater(X, adj, ks, floor=floor),
+    "constrained": lambda X, adj, ks, floor=0, pop=None:
+        constrained_skater(X, adj, ks, pop=pop, floor=floor),
+    "ward": ward_regions,
+    "redcap": redcap_regions,
+    "maxp": maxp_regions,
+}
+# engines that choose k themselves
+FREE_K = {"maxp"}
+# engines 03_skater_range.py runs on the standardized attributes; the others
+# take the raw ones, as spopt's Skater does for the published regions
+SCALED = {"constrained", "ward", "redcap"}
+# engines that have no size floor
+NO_FLOOR = {"ward"}
+
+
+def run_engine(engine, X, adj, n_clusters_list, floor=-np.inf, pop=None,
+               metric=None, ceiling=None, islands="increase"):
+    """Solve as 03_skater_range.py's ``engine`` does, e.g. to redo a stored run.
+
+    ``X`` is standardized for the SCALED engines and raw otherwise; ``metric``
+    overrides the SKATER engines' tree dissimilarity and ``ceiling`` is the
+    constrained engine's population ceiling (both None when not set).
+    """
+    if engine in ("hierarchical", "per-k"):
+        # one pass yields the labels spopt's Skater gives for every k
+        return skater_hierarchy(X, to_w(adj), n_clusters_list, floor=floor,
+                                islands=islands, metric=metric or "manhattan")
+    if engine == "memo":
+        return memo_skater(X, adj, n_clusters_list, floor=floor, islands=islands,
+                           metric=metric or "sqeuclidean")
+    if engine == "constrained":
+        return constrained_skater(X, adj, n_clusters_list, pop=pop, floor=floor,
+                                  ceiling=np.inf if ceiling is None else ceiling,
+                                  islands=islands, metric=metric or "sqeuclidean")
+    return ENGINES[engine](X, adj, n_clusters_list, floor=floor, pop=pop)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+
+# -----------------------------------------------------------------------------
+# Region shape statistics
+#
+# Block groups are projected once to an equal-area CRS. A region's area is the
+# sum of its BG areas, and its perimeter is the sum of BG perimeters minus
+# twice the boundary shared along Queen edges that stay inside the region, so
+# no polygon union is needed. Convex hulls are built for every region of a
+# partition in one vectorized call over the BG vertices.
+# -----------------------------------------------------------------------------
+EQUAL_AREA_CRS = "EPSG:5070"   # NAD83 / Conus Albers, metres
+
+
+def block_group_geometry(gdf, adj):
+    """Per-BG areas, perimeters and vertices plus shared Queen edge lengths.
+
+    ``adj`` is the Queen adjacency in ``gdf`` row order.
+    """
+    geoms = gdf.geometry.to_crs(EQUAL_AREA_CRS).values
+    upper = sparse.triu(adj, k=1).tocoo()
+    shared = shapely.length(shapely.intersection(geoms[upper.row], geoms[upper.col]))
+    coords, owner = shapely.get_coordinates(geoms, return_index=True)
+    return {
+        "area": shapely.area(geoms),
+        "perimeter": shapely.length(geoms),
+        "edge_i": upper.row,
+        "edge_j": upper.col,
+        "edge_len": shared,
+        "coords": coords,
+        "owner": owner,
+    }
+
+
+def region_shape_stats(base, labels):
+    """Shape statistics for every region of one partition.
+
+    ``labels`` is the region label of each BG. Returns one row per region with
+    ``n_block_groups``, ``area_sq_km``, ``perimeter_km``, ``polsby_popper``
+    (4πA/P², 1 for a circle), ``convex_hull_ratio`` (A / hull area) and
+    ``compactness`` (P²/A, the index this analysis reported before).
+    """
+    regions, codes = np.unique(np.asarray(labels), return_inverse=True)
+    n = len(regions)
+
+    size = np.bincount(codes, minlength=n)
+    area = np.bincount(codes, weights=base["area"], minlength=n)
+    perimeter = np.bincount(codes, weights=base["perimeter"], minlength=n)
+    ci, cj = codes[base["edge_i"]], codes[base["edge_j"]]
+    inside = ci == cj
+    perimeter -= 2 * np.bincount(ci[inside], weights=base["edge_len"][inside],
+                                 minlength=n)
+
+    point_region = codes[base["owner"]]
+    order = np.argsort(point_region, kind="stable")
+    points = shapely.multipoints(base["coords"][order], indices=point_region[order])
+    hull_area = shapely.area(shapely.convex_hull(points))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "cluster_id": regions,
+            "n_block_groups": size,
+            "area_sq_km": area / 1e6,
+            "perimeter_km": perimeter / 1e3,
+            "polsby_popper": 4 * np.pi * area / perimeter ** 2,
+            "convex_hull_ratio": area / hull_area,
+            "compactness": np.where(area > 0, perimeter ** 2 / area, 0.0),
+        })
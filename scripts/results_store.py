@@ -0,0 +1,185 @@
+import os
+import json
+import glob
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from weights_cache import weights_key
+
+# -----------------------------------------------------------------------------
+# Partition results store
+#
+# output/results/
+#   blocks.parquet            GeoParquet: GEOID, geometry and the SES
+#                             indicators under their full ACS names, in the row
+#                             order every label vector follows; its pandas
+#                             attrs hold the weights_key and an attribute hash,
+#                             so unchanged blocks are not rewritten
+#   labels/part-<n>.parquet   int16 label columns, one per run; every append
+#                             writes a new part, nothing is rewritten
+#   runs.jsonl                one JSON line per run: run id, part, k, floor,
+#                             engine and whatever else the writer records
+#   vintages/v<n>/            an earlier blocks.parquet with its labels/ and
+#                             runs.jsonl, moved aside when the GEOIDs changed;
+#                             each is a store of its own (pass it as ``store``)
+# Together the parts form the BG x run label matrix. Reading one run touches
+# only its column chunk in one part (memory-mapped). Run ids keep counting
+# across vintages, so an id names one run in the whole store.
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "output", "results")
+
+
+def _paths(store):
+    return (os.path.join(store, "blocks.parquet"),
+            os.path.join(store, "labels"),
+            os.path.join(store, "runs.jsonl"))
+
+
+def blocks_keys(gdf):
+    """weights_key (GEOID order and geometry) plus a hash of the other columns."""
+    attrs = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    h = hashlib.sha1(",".join(map(str, attrs.columns)).encode())
+    h.update(pd.util.hash_pandas_object(attrs, index=False).to_numpy().tobytes())
+    return {"weights_key": weights_key(gdf), "attributes_key": h.hexdigest()[:16]}
+
+
+def _vintages(store):
+    return sorted(glob.glob(os.path.join(store, "vintages", "v*")))
+
+
+def write_blocks(gdf, store=RESULTS_DIR):
+    """Store the rows (GEOID, geometry, attributes) runs are labelled against.
+
+    Nothing is written when the stored blocks have the same keys (see
+    blocks_keys). When the GEOIDs or their order change, the existing runs no
+    longer line up: the old blocks, labels and runs move to a new
+    ``vintages/v<n>`` directory, whose path is returned (None otherwise).
+    """
+    blocks_path, labels_dir, runs_path = _paths(store)
+    keys = blocks_keys(gdf)
+    archive = None
+    if os.path.exists(blocks_path):
+        # pandas keeps DataFrame.attrs in the Parquet schema metadata
+        meta = pq.read_schema(blocks_path).metadata or {}
+        stored = json.loads(meta.get(b"PANDAS_ATTRS", b"{}"))
+        if all(stored.get(key) == value for key, value in keys.items()):
+            os.makedirs(labels_dir, exist_ok=True)
+            return None
+        old = pq.read_table(blocks_path, columns=["GEOID"]).column("GEOID").to_pylist()
+        if old != gdf["GEOID"].tolist():
+            archive = os.path.join(store, "vintages", f"v{len(_vintages(store)):03d}")
+            print(f"Block groups changed; moving the stored runs to {archive}")
+            os.makedirs(archive)
+            for path in (blocks_path, labels_dir, runs_path):
+                if os.path.exists(path):
+                    os.replace(path, os.path.join(archive, os.path.basename(path)))
+    os.makedirs(labels_dir, exist_ok=True)
+    gdf = gdf.copy(deep=False)
+    gdf.attrs.update(keys)
+    gdf.to_parquet(blocks_path, index=False)
+    return archive
+
+
+def list_runs(store=RESULTS_DIR):
+    """Run metadata, one row per run in append order."""
+    runs_path = _paths(store)[2]
+    if not os.path.exists(runs_path):
+        return pd.DataFrame(columns=["run", "part", "k", "floor", "engine"])
+    with open(runs_path) as fh:
+        return pd.DataFrame([json.loads(line) for line in fh if line.strip()])
+
+
+def append_runs(labels, runs, store=RESULTS_DIR):
+    """Append label vectors with their metadata; returns the new run ids.
+
+    ``labels`` is an (n, m) array in blocks.parquet row order and ``runs`` a
+    list of m dicts (at least ``k``; ``floor``, ``engine`` etc. as known).
+    """
+    labels = np.asarray(labels)
+    if labels.ndim == 1:
+        labels = labels[:, None]
+    if labels.max(initial=0) > np.iinfo(np.int16).max:
+        raise ValueError("labels do not fit int16")
+    _, labels_dir, runs_path = _paths(store)
+    os.makedirs(labels_dir, exist_ok=True)
+
+    # ids continue after every run of this and the archived vintages
+    stored = pd.concat([list_runs(s)["run"] for s in [store] + _vintages(store)])
+    n_runs = stored.str[1:].astype(int).max() + 1 if len(stored) else 0
+    part = len(glob.glob(os.path.join(labels_dir, "part-*.parquet")))
+    ids = [f"r{n_runs + j:05d}" for j in range(labels.shape[1])]
+    table = pa.table({rid: pa.array(labels[:, j].astype(np.int16))
+                      for j, rid in enumerate(ids)})
+    pq.write_table(table, os.path.join(labels_dir, f"part-{part:05d}.parquet"))
+
+    created = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(runs_path, "a") as fh:
+        for rid, meta in zip(ids, runs):
+            record = {"run": rid, "part": part, "created": created, **meta}
+            fh.write(json.dumps(record, default=lambda v: v.item()) + "\n")
+    return ids
+
+
+def find_run(k=None, floor=None, engine=None, store=RESULTS_DIR):
+    """Metadata of the latest run with ``k`` (and ``floor`` / ``engine``).
+
+    ``k=None`` takes the largest k of the latest append (one 03 sweep) among
+    the matching runs.
+    """
+    runs = list_runs(store)
+    mask = pd.Series(True, index=runs.index)
+    if floor is not None:
+        mask &= runs["floor"] == floor
+    if engine is not None:
+        mask &= runs["engine"] == engine
+    if k is None and mask.any():
+        latest = runs[mask & (runs["part"] == runs.loc[mask, "part"].max())]
+        k = latest["k"].max()
+    mask &= runs["k"] == k
+    if not mask.any():
+        raise KeyError(f"no stored run with k = {k}, floor = {floor}, engine = {engine}")
+    return runs[mask].iloc[-1]
+
+
+def run_params(meta):
+    """Run metadata as a dict; keys an older run did not record are None."""
+    return {key: None if np.ndim(value) == 0 and pd.isna(value) else value
+            for key, value in dict(meta).items()}
+
+
+def read_labels(runs, store=RESULTS_DIR):
+    """int16 label columns for run ids ``runs``, indexed by GEOID."""
+    blocks_path, labels_dir, _ = _paths(store)
+    meta = list_runs(store).set_index("run")
+    columns = {}
+    for rid in runs:
+        part = os.path.join(labels_dir, f"part-{int(meta.loc[rid, 'part']):05d}.parquet")
+        columns[rid] = (pq.read_table(part, columns=[rid], memory_map=True)
+                        .column(rid).to_numpy())
+    geoid = pq.read_table(blocks_path, columns=["GEOID"]).column("GEOID").to_pandas()
+    return pd.DataFrame(columns, index=pd.Index(geoid, name="GEOID"))
+
+
+def read_blocks(columns=None, store=RESULTS_DIR):
+    """The stored block groups (GeoDataFrame, or DataFrame without geometry)."""
+    blocks_path = _paths(store)[0]
+    if columns is not None and "geometry" not in columns:
+        return pd.read_parquet(blocks_path, columns=columns)
+    return gpd.read_parquet(blocks_path, columns=columns, memory_map=True)
+
+
+def read_partition(k=None, floor=None, engine=None, columns=None, store=RESULTS_DIR):
+    """Stored block groups with the latest matching run as ``skater_<k>``.
+
+    ``k=None`` resolves as in find_run; the column then names that k.
+    """
+    run = find_run(k, floor, engine, store)
+    blocks = read_blocks(columns, store)
+    blocks[f"skater_{int(run['k'])}"] = (read_labels([run["run"]], store)[run["run"]]
+                                         .to_numpy())
+    return blocks
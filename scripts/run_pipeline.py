@@ -0,0 +1,265 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+import pandas as pd
+from geo_io import read_geometry
+from weights_cache import load_neighbors
+from region_engines import NO_FLOOR
+
+# -----------------------------------------------------------------------------
+# Single-process pipeline runner
+#
+# Every numbered script exposes run(...) as its stage function. The runner
+# imports them once into this interpreter, runs them in dependency order and
+# hands frames from one stage to the next in memory. A stage is skipped when
+# the content hash of its code, input files and parameters matches the last
+# successful run and its outputs still exist; if a later stage then needs the
+# skipped stage's result, it is loaded from those outputs.
+# -----------------------------------------------------------------------------
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPT_DIR)
+OUT_DIR = os.path.join(BASE_DIR, "output")
+STATE_PATH = os.path.join(OUT_DIR, "cache", "pipeline_state.json")
+
+
+def _out(name):
+    return os.path.join(OUT_DIR, name)
+
+
+def _shp(stem):
+    return [_out(f"{stem}.{ext}") for ext in ("shp", "shx", "dbf", "prj")]
+
+
+SES_SHP = _out("cook_bg_acs2020_ses.shp")
+SKATER_SHP = _out("cook_bg_skater_60_90.shp")
+RESULTS_DIR = _out("results")
+RESULTS_STORE = [os.path.join(RESULTS_DIR, name) for name in ("blocks.parquet", "runs.jsonl")]
+
+# name: script, helper modules it depends on, {run kwarg: context key},
+#       context keys it provides, input files, output files
+STAGES = [
+    {"name": "acs", "script": "01_extract_and_merge_acs.py",
+     "helpers": ["acs_ingest.py", "geo_io.py"],
+     "needs": {}, "provides": ["ses_gdf"],
+     "inputs": [os.path.join(BASE_DIR, "data", "ACSDT5Y2020.*-Data.csv"),
+                os.path.join(BASE_DIR, "shapefiles", "tl_2020_17_bg.*")],
+     "outputs": _shp("cook_bg_acs2020_ses") + [_out("cook_bg_acs2020_ses.csv"),
+                                               _out("cook_bg_acs2020_moe.csv")]},
+    {"name": "weights", "script": "02_build_weights.py",
+     "helpers": ["weights_cache.py"],
+     "needs": {"gdf": "ses_gdf"}, "provides": ["adj"],
+     "inputs": _shp("cook_bg_acs2020_ses"),
+     "outputs": [_out("cook_bg_queen_neighbors.parquet"),
+                 _out("cook_bg_queen_neighbors.npz")]},
+    {"name": "skater", "script": "03_skater_range.py",
+     "helpers": ["skater_hierarchy.py", "memo_skater.py", "k_selection.py",
+                 "constrained_skater.py", "spanning_tree.py", "region_engines.py",
+                 "partition_metrics.py",
+                 "results_store.py", "acs_ingest.py", "weights_cache.py"],
+     "needs": {"gdf": "ses_gdf", "adj": "adj"}, "provides": ["skater_gdf", "metrics"],
+     "inputs": _shp("cook_bg_acs2020_ses") + [_out("cook_bg_queen_neighbors.npz")],
+     "outputs": _shp("cook_bg_skater_60_90") + [_out("skater_metrics_60_90.csv")]
+                + RESULTS_STORE},
+    {"name": "sizes", "script": "04_region_sizes.py", "helpers": ["results_store.py"],
+     "needs": {}, "provides": ["sizes"],
+     "inputs": RESULTS_STORE + [os.path.join(RESULTS_DIR, "labels", "part-*.parquet")],
+     "outputs": [_out("cluster_sizes_*.csv")]},
+    {"name": "means", "script": "05_cluster_means.py",
+     "helpers": ["results_store.py", "acs_ingest.py"],
+     "needs": {}, "provides": [],
+     "inputs": RESULTS_STORE + [os.path.join(RESULTS_DIR, "labels", "part-*.parquet")],
+     "outputs": [_out("cluster_means_*.csv")]},
+    {"name": "summary", "script": "06_region_summary.py",
+     "helpers": ["results_store.py", "region_geometry.py", "weights_cache.py",
+                 "acs_ingest.py"],
+     "needs": {}, "provides": [],
+     "inputs": RESULTS_STORE + [os.path.join(RESULTS_DIR, "labels", "part-*.parquet")],
+     "outputs": [_out("region_summary.csv")]},
+    {"name": "lisa", "script": "14_spatial_autocorrelation.py",
+     "helpers": ["results_store.py", "weights_cache.py", "acs_ingest.py"],
+     "needs": {}, "provides": [],
+     "inputs": RESULTS_STORE + [os.path.join(RESULTS_DIR, "labels", "part-*.parquet")],
+     "outputs": [_out("moran_global.csv"), _out("lisa_block_groups.csv")]},
+    {"name": "comparison_maps", "script": "07_skater_vs_variables_maps.py",
+     "helpers": ["map_render.py"], "needs": {"gdf": "skater_gdf"}, "provides": [],
+     "inputs": _shp("cook_bg_skater_60_90"),
+     "outputs": [_out("skater_vs_ses_comparison.png")]},
+    {"name": "spatial_stats", "script": "10_cluster_spatial_analysis.py",
+     "helpers": ["region_geometry.py", "weights_cache.py", "map_render.py"],
+     "needs": {"gdf": "skater_gdf"}, "provides": [],
+     "inputs": _shp("cook_bg_skater_60_90"),
+     "outputs": [_out("cluster_spatial_stats.csv")]},
+    {"name": "ses_maps", "script": "11_ses_variable_maps.py",
+     "helpers": ["map_render.py"],
+     "needs": {"gdf": "skater_gdf"}, "provides": [],
+     "inputs": _shp("cook_bg_skater_60_90"),
+     "outputs": [_out("ses_variables_maps.png")]},
+    {"name": "region_map", "script": "skater_plot.py",
+     "helpers": ["map_render.py"],
+     "needs": {"gdf": "skater_gdf"}, "provides": [],
+     "inputs": _shp("cook_bg_skater_60_90"),
+     "outputs": [_out("map_skater_*.png")]},
+    {"name": "tiles", "script": "12_export_tiles.py",
+     "helpers": ["map_render.py"],
+     "needs": {"gdf": "skater_gdf"}, "provides": [],
+     "inputs": _shp("cook_bg_skater_60_90"),
+     "outputs": [_out(os.path.join("tiles", name)) for name in
+                 ("block_groups.pmtiles", "regions.pmtiles", "index.html")]},
+    {"name": "bss_tss_plot", "script": "bss-tssvk-plot.py", "helpers": [],
+     "needs": {"df": "metrics"}, "provides": [],
+     "inputs": [_out("skater_metrics_60_90.csv"), _out("skater_k_selection.csv")],
+     "outputs": [_out("bss_tss_vs_k.png")]},
+    {"name": "size_hist", "script": "skater_sizes_distribution.py", "helpers": [],
+     "needs": {"sizes": "sizes"}, "provides": [],
+     "inputs": [_out("cluster_sizes_*.csv")],
+     "outputs": [_out("region_size_hist_*.png")]},
+]
+
+# How to recover a context value from disk when its stage was skipped
+LOADERS = {
+    "ses_gdf": lambda: read_geometry(SES_SHP),
+    "adj": lambda: load_neighbors(_out("cook_bg_queen_neighbors.npz"))[0],
+    "skater_gdf": lambda: read_geometry(SKATER_SHP),
+    "metrics": lambda: pd.read_csv(_out("skater_metrics_60_90.csv")),
+    "sizes": lambda: pd.read_csv(max(glob.glob(_out("cluster_sizes_*.csv")),
+                                     key=os.path.getmtime)),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the pipeline in one process")
+    parser.add_argument("--only", nargs="+", default=None,
+                        help="stage names to consider (default: all)")
+    parser.add_argument("--force", action="store_true",
+                        help="run stages even when their inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="process pool size for the SKATER, LISA and map stages")
+    parser.add_argument("--k-min", type=int, default=75)
+    parser.add_argument("--k-max", type=int, default=90)
+    parser.add_argument("--k-step", type=int, default=5)
+    parser.add_argument("--k", type=int, default=None,
+                        help="stored k for the sizes, means and LISA stages "
+                             "(default: the largest k of the latest sweep)")
+    parser.add_argument("--floors", type=int, nargs="+", default=None,
+                        help="region size floors (default 10; ward has none)")
+    parser.add_argument("--engine", default="hierarchical",
+                        choices=["hierarchical", "per-k", "memo", "constrained",
+                                 "ward", "redcap"],
+                        help="03_skater_range.py engine (maxp picks its own k "
+                             "and is benchmark.py only)")
+    parser.add_argument("--pop-ceiling", type=float, default=None)
+    parser.add_argument("--metric", default=None,
+                        choices=["manhattan", "euclidean", "sqeuclidean", "mahalanobis"])
+    parser.add_argument("--k-search", choices=["grid", "adaptive"], default="grid")
+    parser.add_argument("--min-gain", type=float, default=5e-4)
+    return parser.parse_args()
+
+
+def file_digest(path, h):
+    with open(path, "rb") as fh:
+        if path.endswith(".dbf"):
+            # bytes 1-3 of a DBF header are the last-update date
+            head = fh.read(4)
+            h.update(head[:1])
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+
+
+def stage_key(stage, params):
+    h = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+    for name in [stage["script"]] + stage["helpers"]:
+        file_digest(os.path.join(SCRIPT_DIR, name), h)
+    for pattern in stage["inputs"]:
+        for path in sorted(glob.glob(pattern)):
+            h.update(os.path.basename(path).encode())
+            file_digest(path, h)
+    return h.hexdigest()
+
+
+def load_stage(stage):
+    name = f"stage_{stage['name']}"
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(SCRIPT_DIR, stage["script"]))
+    module = importlib.util.module_from_spec(spec)
+    # registered so pool workers (fork) can resolve functions by module name
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class Context(dict):
+    """Stage results by key, loaded from disk on first use when missing."""
+
+    def __missing__(self, key):
+        print(f"[pipeline] loading {key} from disk")
+        value = LOADERS[key]()
+        self[key] = value
+        return value
+
+
+def main():
+    args = parse_args()
+    floor = None if args.engine in NO_FLOOR else (args.floors or [10])[0]
+    params = {"skater": {"workers": args.workers, "k_min": args.k_min,
+                         "k_max": args.k_max, "k_step": args.k_step,
+                         "floors": args.floors, "engine": args.engine,
+                         "pop_ceiling": args.pop_ceiling,
+                         "k_search": args.k_search, "min_gain": args.min_gain,
+                         "metric": args.metric},
+              # single-partition stages read the store at the first floor
+              "sizes": {"k": args.k, "floor": floor},
+              "means": {"k": args.k, "floor": floor},
+              "lisa": {"workers": args.workers, "k": args.k, "floor": floor},
+              # with several floors the label-column stages map the first one
+              "comparison_maps": {"workers": args.workers, "floor": floor},
+              "spatial_stats": {"floor": floor},
+              "region_map": {"workers": args.workers, "floor": floor},
+              "tiles": {"floor": floor}}
+
+    state = {}
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as fh:
+            state = json.load(fh)
+
+    ctx = Context()
+    total = time.perf_counter()
+    for stage in STAGES:
+        name = stage["name"]
+        if args.only and name not in args.only:
+            continue
+
+        key = stage_key(stage, params.get(name, {}))
+        # output paths may be patterns, e.g. one file per k
+        outputs_exist = all(glob.glob(p) for p in stage["outputs"])
+        if not args.force and state.get(name) == key and outputs_exist:
+            print(f"[pipeline] {name}: inputs unchanged, skipped")
+            continue
+
+        print(f"[pipeline] {name}: running {stage['script']}")
+        start = time.perf_counter()
+        kwargs = {arg: ctx[src] for arg, src in stage["needs"].items()}
+        kwargs.update(params.get(name, {}))
+        result = load_stage(stage).run(**kwargs)
+
+        provides = stage["provides"]
+        if len(provides) == 1:
+            ctx[provides[0]] = result
+        elif provides:
+            ctx.update(zip(provides, result))
+
+        state[name] = key
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        with open(STATE_PATH, "w") as fh:
+            json.dump(state, fh, indent=2)
+        print(f"[pipeline] {name}: done in {time.perf_counter() - start:.1f}s")
+
+    print(f"[pipeline] finished in {time.perf_counter() - total:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
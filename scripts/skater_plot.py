@@ -1,23 +1,30 @@
 import os
-import geopandas as gpd
-import matplotlib
-matplotlib.use("Agg")  # no GUI
-import matplotlib.pyplot as plt
+from geo_io import read_geometry
+from map_render import render_maps, skater_columns
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
 
 shp_path = os.path.join(OUT_DIR, "cook_bg_skater_60_90.shp")  # adjust if different
-gdf = gpd.read_file(shp_path)
 
-col = "skater_90"
 
-fig, ax = plt.subplots(1, 1, figsize=(8, 8))
-gdf.plot(column=col, categorical=True, legend=False, linewidth=0.1,
-         edgecolor="black", ax=ax)
-ax.set_axis_off()
-ax.set_title("SKATER Regions (k = 90)", fontsize=14)
+def run(gdf=None, workers=1, floor=None):
+    """Stage entry point: one region map per k at ``floor`` (map_skater_<k>.png)."""
+    if gdf is None:
+        gdf = read_geometry(shp_path)
 
-out_png = os.path.join(OUT_DIR, "map_skater_90.png")
-plt.savefig(out_png, dpi=300, bbox_inches="tight")
-print("Saved:", out_png)
+    specs = []
+    for k, col in skater_columns(gdf, floor).items():
+        specs.append({
+            "out": os.path.join(OUT_DIR, f"map_skater_{k}.png"),
+            "figsize": (8, 8),
+            "panels": [{"values": gdf[col].to_numpy(), "categorical": True,
+                        "cmap": "tab20", "linewidth": 0.1, "edgecolor": "black",
+                        "title": f"SKATER Regions (k = {k})",
+                        "title_kwds": {"fontsize": 14}}],
+        })
+    render_maps(gdf, specs, workers=workers)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,4 +1,5 @@
 import os
+import glob
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")  
@@ -6,13 +7,24 @@ import matplotlib.pyplot as plt
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUT_DIR = os.path.join(BASE_DIR, "output")
-sizes_path = os.path.join(OUT_DIR, "cluster_sizes_90.csv")
+# written by 04_region_sizes.py, one file per k
+sizes_pattern = os.path.join(OUT_DIR, "cluster_sizes_*.csv")
 
-sizes = pd.read_csv(sizes_path)  
 
-plt.figure()
-plt.hist(sizes["n_bgs"], bins=20)
-plt.xlabel("Block groups per region")
-plt.ylabel("Number of regions")
-plt.title("Region size distribution (k = 90)")
-plt.savefig(os.path.join(OUT_DIR, "region_size_hist_90.png"), dpi=300, bbox_inches="tight")
+def run(sizes=None):
+    """Stage entry point: histogram of region sizes (latest cluster_sizes_<k>.csv)."""
+    if sizes is None:
+        sizes = pd.read_csv(max(glob.glob(sizes_pattern), key=os.path.getmtime))
+    k = sizes["k"].iloc[0]
+
+    plt.figure()
+    plt.hist(sizes["n_bgs"], bins=20)
+    plt.xlabel("Block groups per region")
+    plt.ylabel("Number of regions")
+    plt.title(f"Region size distribution (k = {k})")
+    plt.savefig(os.path.join(OUT_DIR, f"region_size_hist_{k}.png"), dpi=300, bbox_inches="tight")
+    plt.close("all")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,145 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from libpysal.weights import Queen, W
+
+# -----------------------------------------------------------------------------
+# Queen contiguity cache
+#
+# Adjacency is stored as CSR arrays in output/cache/queen_<key>.npz, where the
+# key hashes the GEOID list and the geometry WKB. Contiguity between two
+# polygons does not depend on any other polygon, so every row subset (dropping
+# NaN rows or islands) is just a subgraph of the cached matrix.
+# -----------------------------------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, "output", "cache")
+CACHE_VERSION = b"queen-v1"
+
+
+def weights_key(gdf):
+    """Hash of the GEOID order and geometry of ``gdf``."""
+    h = hashlib.sha1(CACHE_VERSION)
+    h.update("\n".join(gdf["GEOID"].astype(str)).encode())
+    for wkb in gdf.geometry.to_wkb():
+        h.update(wkb)
+    return h.hexdigest()[:16]
+
+
+def save_adjacency(path, adj, geoids):
+    adj = sparse.csr_matrix(adj)
+    np.savez(path, indptr=adj.indptr, indices=adj.indices,
+             shape=np.array(adj.shape), geoids=np.asarray(geoids, dtype=str))
+
+
+def load_adjacency(path):
+    """Return ``(adj, geoids)`` from an ``.npz`` written by save_adjacency."""
+    with np.load(path) as z:
+        indices = z["indices"]
+        adj = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int8), indices, z["indptr"]),
+            shape=tuple(z["shape"]),
+        )
+        geoids = z["geoids"]
+    return adj, geoids
+
+
+def export_adjacency(path, adj, geoids):
+    """Write the graph keyed by real GEOIDs.
+
+    ``.parquet`` gives an edge list (``GEOID``, ``neighbor_GEOID``) with each
+    undirected edge stored once and islands as rows with a null neighbor;
+    ``.npz`` gives the CSR arrays plus GEOIDs.
+    """
+    geoids = np.asarray(geoids, dtype=str)
+    if path.endswith(".npz"):
+        save_adjacency(path, adj, geoids)
+        return
+    upper = sparse.triu(adj, k=1).tocoo()
+    lonely = islands(sparse.csr_matrix(adj))
+    pd.DataFrame({
+        "GEOID": np.concatenate([geoids[upper.row], geoids[lonely]]),
+        "neighbor_GEOID": pd.array(
+            np.concatenate([geoids[upper.col], np.full(len(lonely), None)]),
+            dtype="string",
+        ),
+    }).to_parquet(path, index=False)
+
+
+def load_neighbors(path):
+    """Return ``(adj, geoids)`` from a file written by export_adjacency.
+
+    Parquet edge lists come back with GEOIDs in sorted order.
+    """
+    if path.endswith(".npz"):
+        return load_adjacency(path)
+    table = pd.read_parquet(path)
+    edges = table.dropna(subset=["neighbor_GEOID"])
+    src = edges["GEOID"].to_numpy(dtype=str)
+    dst = edges["neighbor_GEOID"].to_numpy(dtype=str)
+    geoids = np.unique(np.concatenate([table["GEOID"].to_numpy(dtype=str), dst]))
+    row = np.searchsorted(geoids, src)
+    col = np.searchsorted(geoids, dst)
+    adj = sparse.csr_matrix(
+        (np.ones(2 * len(edges), dtype=np.int8),
+         (np.concatenate([row, col]), np.concatenate([col, row]))),
+        shape=(len(geoids), len(geoids)),
+    )
+    return adj, geoids
+
+
+def queen_adjacency(gdf, cache_dir=CACHE_DIR):
+    """Binary Queen adjacency (CSR, gdf row order), built once per geometry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"queen_{weights_key(gdf)}.npz")
+    if os.path.exists(path):
+        print(f"Loading cached Queen weights: {path}")
+        return load_adjacency(path)[0]
+
+    print("Constructing Queen contiguity weights (not cached yet)...")
+    w = Queen.from_dataframe(gdf, use_index=False)
+    adj = sparse.csr_matrix(w.sparse, dtype=np.int8)
+    adj.data[:] = 1
+    save_adjacency(path, adj, gdf["GEOID"].to_numpy())
+    print(f"Cached Queen weights to: {path}")
+    return adj
+
+
+def subgraph(adj, keep):
+    """Adjacency restricted to ``keep`` (boolean mask or positional indices)."""
+    keep = np.asarray(keep)
+    if keep.dtype == bool:
+        keep = np.flatnonzero(keep)
+    return adj[keep][:, keep].tocsr()
+
+
+def islands(adj):
+    """Positional indices of units with no neighbors."""
+    return np.flatnonzero(np.diff(adj.indptr) == 0)
+
+
+def filter_rows(gdf, adj, attrs):
+    """Drop rows missing any of ``attrs``, then islands, from ``gdf`` and ``adj``.
+
+    Both steps take subgraphs of ``adj`` instead of building Queen weights
+    again. Returns ``(gdf, adj, n_islands)`` with a fresh 0..n-1 index.
+    """
+    keep = gdf[attrs].notna().all(axis=1).to_numpy()
+    gdf = gdf[keep].reset_index(drop=True)
+    adj = subgraph(adj, keep)
+    lonely = islands(adj)
+    if len(lonely):
+        gdf = gdf.drop(index=lonely).reset_index(drop=True)
+        adj = subgraph(adj, np.setdiff1d(np.arange(adj.shape[0]), lonely))
+    return gdf, adj, len(lonely)
+
+
+def to_w(adj):
+    """libpysal W with ids 0..n-1, matching Queen.from_dataframe(use_index=False)."""
+    adj = sparse.csr_matrix(adj)
+    neighbors = {
+        i: adj.indices[adj.indptr[i]:adj.indptr[i + 1]].tolist()
+        for i in range(adj.shape[0])
+    }
+    return W(neighbors, silence_warnings=True)